@@ -0,0 +1,232 @@
+"""
+Headless bulk audit of marketing documents.
+
+Screens a directory (or a manifest listing files, one path per line) with
+the Greenwashing Radar Rover prompt, without the Streamlit UI:
+
+    python audit.py product_sheets/ --output audit.jsonl --concurrency 8
+
+Files are parsed by the ingest engine, then up to `--concurrency` model
+requests run at once. Rate limits and transient API errors are retried
+with exponential backoff; a rate limit also pauses every other request,
+honouring Retry-After when the API sends it. Each result is appended to
+the JSONL output as soon as it is ready, so an interrupted run started
+again with the same output skips files already audited (unless their
+content changed) and retries the ones that failed.
+
+The API key is read from OPENAI_API_KEY, or from .streamlit/secrets.toml.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import ingest
+from prompts import prompt1
+from tokens import CHARS_PER_TOKEN
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.2   # Lower than the chat, for comparable audits
+DEFAULT_CONCURRENCY = 8
+MAX_SIZE_MB = 20
+DOC_TOKENS = 12_000         # Document text sent per request
+MAX_RETRIES = 6
+BACKOFF = 2.0               # Seconds before the first retry, doubled each time
+MAX_BACKOFF = 60.0
+SECRETS_FILE = Path(__file__).resolve().parent / ".streamlit" / "secrets.toml"
+
+AUDIT_REQUEST = """Please audit this marketing document for greenwashing risks.
+List each environmental claim it makes, explain why it could mislead (for example vague, unsubstantiated, irrelevant or hiding a trade-off), rate its risk as low, medium or high and suggest a compliant rewording. Finish with an overall risk rating.
+
+File: {name}
+{text}"""
+
+
+def list_inputs(source: str) -> List[Tuple[str, Path]]:
+    """(id, path) pairs to audit from a directory or a manifest file."""
+    root = Path(source)
+    if root.is_dir():
+        paths = sorted(p for p in root.rglob("*") if p.is_file() and ingest.file_kind(p.name))
+        return [(str(p.relative_to(root)), p) for p in paths]
+    inputs = []
+    for line in root.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            path = Path(line) if Path(line).is_absolute() else root.parent / line
+            inputs.append((line, path))
+    return inputs
+
+def load_checkpoint(output: Path) -> Dict[str, str]:
+    """Files already audited in `output`, as id -> content hash."""
+    done = {}
+    if not output.exists():
+        return done
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue    # A line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done[record["file"]] = record["sha256"]
+    return done
+
+def load_api_key():
+    """Configure the openai module from the environment or Streamlit secrets."""
+    import openai
+
+    if not openai.api_key and SECRETS_FILE.exists():
+        import tomllib
+        with open(SECRETS_FILE, "rb") as f:
+            openai.api_key = tomllib.load(f).get("openai", {}).get("api_key")
+    if not openai.api_key:
+        raise RuntimeError("Set OPENAI_API_KEY or add [openai] api_key to .streamlit/secrets.toml")
+    return openai
+
+
+class Auditor:
+    """Parses files and sends audit requests with bounded concurrency."""
+
+    def __init__(self, openai, model: str = DEFAULT_MODEL, temperature: float = DEFAULT_TEMPERATURE,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 doc_tokens: int = DOC_TOKENS):
+        self.openai = openai
+        self.model = model
+        self.temperature = temperature
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.doc_chars = doc_tokens * CHARS_PER_TOKEN
+        self.paused_until = 0.0     # Set by rate limits, shared by all requests
+        self.retries = 0
+
+    def messages(self, name: str, text: str) -> list:
+        return [
+            {"role": "system", "content": prompt1},
+            {"role": "user", "content": AUDIT_REQUEST.format(name=name, text=text[:self.doc_chars])},
+        ]
+
+    async def complete(self, messages: list) -> Tuple[str, dict, int]:
+        """Answer, token usage and attempts for one request, retrying transient errors."""
+        errors = self.openai.error
+        for attempt in range(1, self.max_retries + 2):
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                response = await self.openai.ChatCompletion.acreate(
+                    model=self.model, messages=messages, temperature=self.temperature
+                )
+                return (response["choices"][0]["message"]["content"],
+                        dict(response.get("usage") or {}), attempt)
+            except (errors.RateLimitError, errors.ServiceUnavailableError, errors.APIConnectionError,
+                    errors.Timeout, errors.TryAgain, errors.APIError) as e:
+                if attempt > self.max_retries:
+                    raise
+                self.retries += 1
+                wait = min(MAX_BACKOFF, BACKOFF * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                if isinstance(e, errors.RateLimitError):
+                    retry_after = (e.headers or {}).get("retry-after")
+                    if retry_after:
+                        wait = max(wait, float(retry_after))
+                    # Back off everywhere, not just in this request
+                    self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                print(f"Audit retry {attempt} in {wait:.1f}s: {e}", file=sys.stderr)
+                await asyncio.sleep(wait)
+
+    async def audit(self, file_id: str, path: Path) -> dict:
+        """Result record for one file."""
+        started = time.monotonic()
+        record = {"file": file_id}
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+            record["sha256"] = hashlib.sha256(data).hexdigest()
+            if len(data) > MAX_SIZE_MB * 1024 * 1024:
+                raise ValueError(f"larger than {MAX_SIZE_MB} MB")
+            # Read one character past what the prompt uses, to tell if it was cut
+            result = (await asyncio.to_thread(
+                ingest.extract_files, [(path.name, data)], char_budget=self.doc_chars + 1
+            ))[0]
+            if result.error:
+                raise ValueError(f"could not read file ({result.error})")
+            if not result.text.strip():
+                raise ValueError("no text found")
+            record["chars"] = len(result.text)
+            record["truncated"] = len(result.text) > self.doc_chars
+            answer, usage, attempts = await self.complete(self.messages(path.name, result.text))
+            record.update(status="ok", answer=answer, usage=usage, attempts=attempts)
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record["seconds"] = round(time.monotonic() - started, 3)
+        return record
+
+    async def run(self, inputs: List[Tuple[str, Path]], output: Path) -> dict:
+        """Audit `inputs`, appending each record to `output`; returns counts."""
+        queue = asyncio.Queue()
+        for item in inputs:
+            queue.put_nowait(item)
+        counts = {"ok": 0, "error": 0}
+        started = time.monotonic()
+
+        # Start on a fresh line if the last run was cut off mid-record
+        if output.exists() and output.stat().st_size:
+            with open(output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        else:
+            needs_newline = False
+
+        with open(output, "a", encoding="utf-8") as out:
+            if needs_newline:
+                out.write("\n")
+
+            async def worker():
+                while not queue.empty():
+                    file_id, path = queue.get_nowait()
+                    record = await self.audit(file_id, path)
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    counts[record["status"]] += 1
+                    done = counts["ok"] + counts["error"]
+                    print(f"[{done}/{len(inputs)}] {file_id}: {record['status']} "
+                          f"({record['seconds']}s)", file=sys.stderr)
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        counts["retries"] = self.retries
+        counts["seconds"] = round(time.monotonic() - started, 1)
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="Directory of documents, or a manifest file of paths")
+    parser.add_argument("--output", default="audit.jsonl", help="JSONL results, also the checkpoint")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    done = load_checkpoint(output)
+    todo = []
+    for file_id, path in list_inputs(args.source):
+        if file_id in done and path.exists() and \
+                hashlib.sha256(path.read_bytes()).hexdigest() == done[file_id]:
+            continue
+        todo.append((file_id, path))
+    print(f"{len(todo)} to audit, {len(done)} already in {output}", file=sys.stderr)
+
+    auditor = Auditor(load_api_key(), args.model, args.temperature, args.concurrency, args.max_retries)
+    counts = asyncio.run(auditor.run(todo, output))
+    print(json.dumps(counts))
+    sys.exit(1 if counts["error"] else 0)
+
+if __name__ == "__main__":
+    main()
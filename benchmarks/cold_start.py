@@ -0,0 +1,77 @@
+"""
+Cold-start benchmark for streamlit_app.py.
+
+Each run starts a fresh interpreter, imports Streamlit and renders the
+app's first page (the password gate) with placeholder secrets, timing
+both steps. It also records which heavy dependencies were imported by
+then; none of them should be, as they are only needed after login or on
+the first upload.
+
+    python benchmarks/cold_start.py --runs 5 --output cold_start.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+APP = Path(__file__).resolve().parent.parent / "streamlit_app.py"
+HEAVY_MODULES = ["openai", "supabase", "PyPDF2", "pytesseract", "PIL"]
+
+RUN_ONCE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=60)
+at.secrets["supabase"] = {{"url": "http://localhost", "key": "key", "email": "e", "password": "p"}}
+at.secrets["openai"] = {{"api_key": "sk-placeholder"}}
+at.run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "first_render_seconds": rendered - imported,
+    "errors": [e.message for e in at.exception],
+    "heavy_modules_loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def run_once() -> dict:
+    """Time one cold start in a fresh interpreter."""
+    code = RUN_ONCE.format(app=str(APP), heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=APP.parent
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--max-seconds", type=float,
+                        help="Exit non-zero if median import + first render is slower")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    total = [r["import_seconds"] + r["first_render_seconds"] for r in runs]
+    summary = {
+        "runs": runs,
+        "median_import_seconds": statistics.median(r["import_seconds"] for r in runs),
+        "median_first_render_seconds": statistics.median(r["first_render_seconds"] for r in runs),
+        "median_total_seconds": statistics.median(total),
+        "heavy_modules_loaded": sorted({m for r in runs for m in r["heavy_modules_loaded"]}),
+    }
+    print(json.dumps({k: v for k, v in summary.items() if k != "runs"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = any(r["errors"] for r in runs) or summary["heavy_modules_loaded"]
+    if args.max_seconds is not None and summary["median_total_seconds"] > args.max_seconds:
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
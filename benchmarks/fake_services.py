@@ -0,0 +1,209 @@
+"""
+Local stand-ins for the OpenAI and Supabase HTTP APIs, for benchmarks.
+
+FakeOpenAI answers /chat/completions: streamed requests get server-sent
+event chunks after `first_token_delay`, at `tokens_per_second`; other
+requests (history summaries) get a short answer at once. FakeSupabase
+signs in and refreshes a session under /auth/v1 and stores rows POSTed to
+/rest/v1/<table>, after an optional `write_delay`; the next `fail_writes`
+writes are rejected with a 503. Reads honour the `eq` and `in` filters
+and `order`, and upserts with `on_conflict` skip rows that already exist.
+Both run on daemon threads on a free local port and count what they serve.
+"""
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "Claims such as eco friendly or carbon neutral need evidence that a "
+    "consumer can check. Vague environmental wording should be replaced by "
+    "specific and verifiable statements about the product."
+).split()
+
+
+class _Server:
+    """A ThreadingHTTPServer for `handler` on 127.0.0.1, started on a daemon thread."""
+
+    def __init__(self, handler):
+        handler.service = self
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def send_json(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+# ----------------------------- OpenAI ------------------------------ #
+class _OpenAIHandler(_Handler):
+    def do_POST(self):
+        service = self.service
+        request = self.read_json()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+        with service.lock:
+            service.requests += 1
+            service.prompt_chars += sum(len(m.get("content", "")) for m in request["messages"])
+        if not request.get("stream"):
+            self.send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Summary of earlier turns."}}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(service.first_token_delay)
+        for i in range(service.reply_tokens):
+            word = WORDS[i % len(WORDS)]
+            chunk = {
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "model": request["model"],
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                             "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if service.tokens_per_second:
+                time.sleep(1 / service.tokens_per_second)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeOpenAI(_Server):
+    """Chat completions endpoint with a configurable delay and token rate."""
+
+    def __init__(self, first_token_delay: float = 0.3, tokens_per_second: float = 60,
+                 reply_tokens: int = 80):
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.requests = 0
+        self.prompt_chars = 0
+        super().__init__(type("Handler", (_OpenAIHandler,), {}))
+
+    @property
+    def api_base(self) -> str:
+        return f"{self.url}/v1"
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "prompt_chars": self.prompt_chars}
+
+# ---------------------------- Supabase ----------------------------- #
+class _SupabaseHandler(_Handler):
+    def do_POST(self):
+        service = self.service
+        url = urlparse(self.path)
+        body = self.read_json()
+        if url.path == "/auth/v1/token":
+            grant = parse_qs(url.query).get("grant_type", [""])[0]
+            with service.lock:
+                if grant == "password":
+                    service.logins += 1
+                else:
+                    service.refreshes += 1
+            self.send_json(200, service.session())
+            return
+        if not url.path.startswith("/rest/v1/"):
+            self.send_json(404, {"message": "not found"})
+            return
+        table = url.path[len("/rest/v1/"):]
+        rows = body if isinstance(body, list) else [body]
+        conflict = parse_qs(url.query).get("on_conflict", [None])[0]
+        time.sleep(service.write_delay)
+        with service.lock:
+            if service.fail_writes:
+                service.fail_writes -= 1
+                self.send_json(503, {"message": "service unavailable"})
+                return
+            service.writes += 1
+            stored = service.rows.setdefault(table, [])
+            if conflict:
+                existing = {row.get(conflict) for row in stored}
+                rows = [row for row in rows if row.get(conflict) not in existing]
+            stored.extend(rows)
+        self.send_json(201, rows)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        table = url.path[len("/rest/v1/"):]
+        with self.service.lock:
+            rows = list(self.service.rows.get(table, []))
+        for column, (value,) in parse_qs(url.query).items():
+            if column == "order":
+                name, _, direction = value.partition(".")
+                rows.sort(key=lambda row: row.get(name), reverse=direction.startswith("desc"))
+            elif value.startswith("eq."):
+                rows = [row for row in rows if str(row.get(column)) == value[3:]]
+            elif value.startswith("in.("):
+                allowed = {v.strip('"') for v in value[4:-1].split(",")}
+                rows = [row for row in rows if str(row.get(column)) in allowed]
+        self.send_json(200, rows)
+
+
+class FakeSupabase(_Server):
+    """Auth and PostgREST endpoints that keep inserted rows in memory."""
+
+    # Shaped like a Supabase anon key so the client accepts it
+    KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.fake"
+
+    def __init__(self, write_delay: float = 0.02, session_seconds: int = 3600):
+        self.write_delay = write_delay
+        self.session_seconds = session_seconds
+        self.fail_writes = 0
+        self.rows = {}
+        self.logins = self.refreshes = self.writes = 0
+        super().__init__(type("Handler", (_SupabaseHandler,), {}))
+
+    def session(self) -> dict:
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "access_token": uuid.uuid4().hex, "refresh_token": uuid.uuid4().hex,
+            "token_type": "bearer", "expires_in": self.session_seconds,
+            "user": {"id": str(uuid.uuid4()), "aud": "authenticated", "role": "authenticated",
+                     "app_metadata": {}, "user_metadata": {}, "created_at": now},
+        }
+
+    def row_count(self) -> int:
+        with self.lock:
+            return sum(len(rows) for rows in self.rows.values())
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "logins": self.logins, "refreshes": self.refreshes, "writes": self.writes,
+                "rows": {table: len(rows) for table, rows in self.rows.items()},
+            }
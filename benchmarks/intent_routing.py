@@ -0,0 +1,108 @@
+"""
+Evaluation of the local intent router in intent_router.py.
+
+Runs every example in a labelled JSONL set ({"text": ..., "intent": ...},
+intent one of greeting, capabilities, out_of_scope or model) through the
+router. The set shares no text with the router's training examples and
+includes in-scope questions phrased like small talk or off-topic requests
+("what do you think about palm oil"). It reports:
+
+- routing precision: of the turns answered from a template, the share
+  answered with the right one (a wrong template is the costly mistake);
+- routing recall: the share of trivial turns answered locally;
+- per-intent precision and recall, and the misrouted examples;
+- routing latency (median and p99);
+- how many examples also appear in the training data (should be 0);
+- model calls and tokens saved, counting the opening greeting, the user
+  turn and the reply that the model would otherwise have produced.
+
+    python benchmarks/intent_routing.py --output intent_routing.json
+"""
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intent_router import MODEL, TRAINING_EXAMPLES, IntentRouter, features  # noqa: E402
+from tokens import count_message_tokens, count_tokens  # noqa: E402
+
+EVAL_SET = Path(__file__).resolve().parent / "intent_eval.jsonl"
+OPENING_TOKENS = 110    # The app's opening greeting, sent with every early turn
+REPLY_TOKENS = 150      # Typical model answer to a trivial turn
+REPEATS = 200           # Classifications per example, for stable timings
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--eval-set", default=str(EVAL_SET))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--min-precision", type=float,
+                        help="Exit non-zero if routing precision is lower")
+    args = parser.parse_args()
+
+    with open(args.eval_set, encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    router = IntentRouter()
+
+    outcomes, latencies = [], []
+    for example in examples:
+        route = router.route(example["text"])
+        for _ in range(REPEATS):
+            latencies.append(router.route(example["text"]).seconds)
+        outcomes.append((example, route.intent if route.reply else MODEL))
+
+    trained = {" ".join(features(t)) for texts in TRAINING_EXAMPLES.values() for t in texts}
+    overlap = [e for e in examples if " ".join(features(e["text"])) in trained]
+    routed = [(e, got) for e, got in outcomes if got != MODEL]
+    trivial = [(e, got) for e, got in outcomes if e["intent"] != MODEL]
+    per_intent = {}
+    for intent in sorted({e["intent"] for e in examples}):
+        predicted = [e for e, got in outcomes if got == intent]
+        actual = [got for e, got in outcomes if e["intent"] == intent]
+        per_intent[intent] = {
+            "examples": len(actual),
+            "precision": round(sum(e["intent"] == intent for e in predicted) / len(predicted), 3)
+            if predicted else None,
+            "recall": round(sum(got == intent for got in actual) / len(actual), 3),
+        }
+
+    tokens_saved = sum(
+        OPENING_TOKENS + count_message_tokens({"content": e["text"]}) + REPLY_TOKENS
+        for e, got in routed if e["intent"] == got
+    )
+    summary = {
+        "examples": len(examples),
+        "routed": len(routed),
+        "routing_precision": round(sum(e["intent"] == got for e, got in routed) / len(routed), 3)
+        if routed else None,
+        "routing_recall": round(sum(e["intent"] == got for e, got in trivial) / len(trivial), 3)
+        if trivial else None,
+        "per_intent": per_intent,
+        "overlap_with_training": len(overlap),
+        "median_route_ms": round(statistics.median(latencies) * 1000, 4),
+        "p99_route_ms": round(percentile(latencies, 99) * 1000, 4),
+        "model_calls_saved": sum(e["intent"] == got for e, got in routed),
+        "prompt_and_reply_tokens_saved": tokens_saved,
+        "template_tokens": sum(count_tokens(router.route(e["text"]).reply or "")
+                               for e, _ in routed),
+        "misrouted": [
+            {"text": e["text"], "expected": e["intent"], "got": got}
+            for e, got in outcomes if e["intent"] != got
+        ],
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    if args.min_precision is not None and (summary["routing_precision"] or 0) < args.min_precision:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
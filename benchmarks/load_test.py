@@ -0,0 +1,297 @@
+"""
+Offline load test for streamlit_app.py.
+
+The app is driven headlessly (Streamlit's AppTest) against local stand-ins
+for OpenAI and Supabase from fake_services.py, so each turn goes through
+the real ingest -> prompt -> stream -> save path without network access
+or API keys. Scenarios:
+
+    single_turn    one question in a fresh session
+    long_history   a question after many earlier turns (history compaction)
+    large_pdf      a question with a generated multi-page PDF attached
+    concurrent     several sessions, each in its own process, sending
+                   turns at the same time
+
+Each scenario reports turn latency (median, p95, max), median stage times
+from the app's per-turn trace, and how long queued writes took to reach
+the database. Results can be written as JSON and compared with an earlier
+file:
+
+    python benchmarks/load_test.py --output after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeOpenAI, FakeSupabase  # noqa: E402
+
+APP = Path(__file__).resolve().parent.parent / "streamlit_app.py"
+SCENARIOS = ["single_turn", "long_history", "large_pdf", "concurrent"]
+QUESTIONS = [
+    "Is 'eco friendly' an acceptable claim on a shampoo bottle?",
+    "What evidence do we need to say our packaging is recyclable?",
+    "Can we call the product carbon neutral if we buy offsets?",
+    "Which of these claims would a regulator question first?",
+]
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """A plain text PDF with `pages` pages of label-like claims."""
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [
+            f"Page {page + 1}, item {seed}-{row}: {QUESTIONS[(page + row) % len(QUESTIONS)]}"
+            for row in range(40)
+        ]
+        stream = "BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(
+            f"({escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += (f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n").encode("latin-1")
+    return bytes(out)
+
+def history(turns: int) -> list:
+    """`turns` earlier question/answer pairs of typical length."""
+    messages = [{"role": "assistant", "content": "Hello! How can I help?"}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": QUESTIONS[i % len(QUESTIONS)] + f" ({i})"})
+        messages.append({"role": "assistant", "content": " ".join(
+            f"Point {n}: the claim needs specific, verifiable evidence." for n in range(12))})
+    return messages
+
+# ----------------------------- Sessions ----------------------------- #
+class Session:
+    """One browser session of the app, already past the password gate."""
+
+    def __init__(self, openai_service, supabase_service, messages=None):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(str(APP), default_timeout=300)
+        self.app.secrets["supabase"] = {
+            "url": supabase_service.url, "key": FakeSupabase.KEY,
+            "email": "bench@example.com", "password": "bench",
+        }
+        self.app.secrets["openai"] = {"api_key": "sk-bench"}
+        self.app.session_state.authenticated = True
+        if messages is not None:
+            self.app.session_state.messages = messages
+        self.app.run()
+        self._raise_errors()
+
+    def turn(self, text: str, files=None) -> dict:
+        """Send one message and return its latency and stage times."""
+        self.app.text_input[0].input(text)
+        if files:
+            self.app.file_uploader[0].set_value(files)
+        started = time.perf_counter()
+        self.app.button[-1].click().run()
+        seconds = time.perf_counter() - started
+        self._raise_errors()
+        return {"seconds": seconds, "stages": dict(self.app.session_state.last_trace.stages)}
+
+    def _raise_errors(self):
+        problems = [e.message for e in self.app.exception] + [e.value for e in self.app.error]
+        if problems:
+            raise RuntimeError(f"App error: {problems}")
+
+# ----------------------------- Scenarios ---------------------------- #
+# Each returns its turns, the wall time they took and the seconds until
+# their queued writes had reached the database.
+def sequential(turns) -> dict:
+    done = [turn() for turn in turns]
+    return {
+        "turns": done,
+        "wall_seconds": sum(t["seconds"] for t in done),
+        "persist_seconds": wait_persisted(),
+    }
+
+def single_turn(services, args):
+    return sequential(
+        lambda i=i: Session(*services).turn(QUESTIONS[i % len(QUESTIONS)] + f" [{i}]")
+        for i in range(args.runs)
+    )
+
+def long_history(services, args):
+    return sequential(
+        lambda i=i: Session(*services, messages=history(args.history_turns))
+        .turn(f"And the label? [{i}]")
+        for i in range(args.runs)
+    )
+
+def large_pdf(services, args):
+    # A new document each run, so the extraction cache does not help
+    return sequential(
+        lambda i=i: Session(*services).turn(
+            f"Check the claims in this file [{i}]",
+            [("label.pdf", make_pdf(args.pdf_pages, seed=i), "application/pdf")],
+        )
+        for i in range(args.runs)
+    )
+
+def concurrent(services, args):
+    # AppTest runs one script at a time per process, so each session is a
+    # separate interpreter; all of them talk to the same fake services.
+    # Sessions start once every interpreter is up and has rendered the chat.
+    openai_service, supabase_service = services
+    workers = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--worker", openai_service.api_base,
+             supabase_service.url, str(index), str(args.turns)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for index in range(args.sessions)
+    ]
+    for worker in workers:
+        if worker.stdout.readline().strip() != "ready":
+            raise RuntimeError("Session worker failed to start")
+    started = time.perf_counter()
+    for worker in workers:
+        worker.stdin.write("go\n")
+        worker.stdin.flush()
+    outputs = []
+    for worker in workers:
+        out, _ = worker.communicate()
+        if worker.returncode:
+            raise RuntimeError(f"Session worker failed with exit code {worker.returncode}")
+        outputs.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "turns": [turn for output in outputs for turn in output["turns"]],
+        "wall_seconds": max(output["finished"] for output in outputs) - started,
+        "persist_seconds": max(output["persist_seconds"] for output in outputs),
+    }
+
+def run_worker(api_base, supabase_url, index, turns):
+    """Entry point of one concurrent session: print its results as JSON."""
+    os.environ["OPENAI_API_BASE"] = api_base
+    session = Session(None, type("Remote", (), {"url": supabase_url}))
+    print("ready", flush=True)
+    sys.stdin.readline()
+    done = [
+        session.turn(QUESTIONS[turn % len(QUESTIONS)] + f" [{index}.{turn}]")
+        for turn in range(turns)
+    ]
+    # perf_counter is system-wide on Linux, so the parent can compare it
+    finished = time.perf_counter()
+    print(json.dumps({"turns": done, "finished": finished, "persist_seconds": wait_persisted()}))
+
+# ------------------------------ Report ------------------------------ #
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def summarise(result: dict) -> dict:
+    turns, wall_seconds = result["turns"], result["wall_seconds"]
+    seconds = [t["seconds"] for t in turns]
+    stage_names = sorted({name for t in turns for name in t["stages"]})
+    return {
+        "turns": len(turns),
+        "wall_seconds": round(wall_seconds, 3),
+        "turns_per_second": round(len(turns) / wall_seconds, 3),
+        "median_seconds": round(statistics.median(seconds), 3),
+        "p95_seconds": round(percentile(seconds, 95), 3),
+        "max_seconds": round(max(seconds), 3),
+        "median_stage_seconds": {
+            name: round(statistics.median(t["stages"][name] for t in turns if name in t["stages"]), 4)
+            for name in stage_names
+        },
+        "persist_seconds": round(result["persist_seconds"], 3),
+    }
+
+def wait_persisted(timeout: float = 30.0) -> float:
+    """Seconds until this process has no writes left in its queue."""
+    from metrics import REGISTRY
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        persistence = REGISTRY.gauges.get("persistence")
+        if persistence is None or persistence()["queue_depth"] == 0:
+            break
+        time.sleep(0.01)
+    return time.perf_counter() - started
+
+def compare(summary: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    for name, result in summary.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median_seconds"], result["median_seconds"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:14} median {before:.3f}s -> {after:.3f}s ({change:+.1f}%)")
+
+def main():
+    if sys.argv[1:2] == ["--worker"]:
+        api_base, supabase_url, index, turns = sys.argv[2:6]
+        run_worker(api_base, supabase_url, index, int(turns))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--runs", type=int, default=3, help="Turns per sequential scenario")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=2, help="Turns per concurrent session")
+    parser.add_argument("--history-turns", type=int, default=40)
+    parser.add_argument("--pdf-pages", type=int, default=120)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--reply-tokens", type=int, default=80)
+    parser.add_argument("--write-delay", type=float, default=0.02,
+                        help="Seconds the fake database takes per insert")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare medians with")
+    args = parser.parse_args()
+
+    openai_service = FakeOpenAI(args.first_token_delay, args.tokens_per_second, args.reply_tokens)
+    supabase_service = FakeSupabase(args.write_delay)
+    # Read by the openai package when the app first imports it
+    os.environ["OPENAI_API_BASE"] = openai_service.api_base
+    services = (openai_service, supabase_service)
+
+    from metrics import REGISTRY
+
+    summary = {}
+    for name in args.scenarios:
+        summary[name] = summarise(globals()[name](services, args))
+        print(json.dumps({name: summary[name]}))
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "scenarios": summary,
+        "metrics": REGISTRY.snapshot(),
+        "openai": openai_service.stats(),
+        "supabase": supabase_service.stats(),
+    }
+    if args.baseline:
+        compare(summary, args.baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+OCR benchmark: the preprocessing pipeline in ocr.py against plain
+pytesseract.image_to_string on the raw image (the previous behaviour).
+
+Fixtures are image files with a sibling .txt holding the expected text.
+Without --fixtures a synthetic set is generated: a 12 MP photo-like
+label, a tall label whose claims are spread out (so it is recognised as
+several tiles in parallel), a dark label with light text, a mostly blank
+photo and a small screenshot. Each path reports median latency and text
+recovery (character similarity and share of expected words found); each
+fixture also reports how many tiles the pipeline cuts it into. Tesseract
+must be installed.
+
+    python benchmarks/ocr_pipeline.py --runs 3 --output ocr.json
+"""
+import argparse
+import difflib
+import json
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytesseract  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter, ImageFont  # noqa: E402
+
+import ocr  # noqa: E402
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp")
+CLAIMS = [
+    "100% recyclable packaging made from plant based materials",
+    "Carbon neutral since 2020 through certified offsets",
+    "Eco friendly formula with no harmful chemicals",
+    "Sustainably sourced cotton grown without pesticides",
+    "Our bottles contain 50% recycled ocean plastic",
+    "Net zero emissions across our supply chain by 2030",
+]
+
+
+def _label(size, background, ink, lines, font_size, noise=0, blur=0.0, spacing=1.8):
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=font_size)
+    top = size[1] // 6
+    for i, line in enumerate(lines):
+        draw.text((size[0] // 12, top + i * int(font_size * spacing)), line, fill=ink, font=font)
+    if noise:
+        rng = random.Random(0)
+        pixels = image.load()
+        for _ in range(size[0] * size[1] // 50):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            r, g, b = pixels[x, y]
+            shift = rng.randint(-noise, noise)
+            pixels[x, y] = (r + shift, g + shift, b + shift)
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    return image
+
+def make_fixtures(directory: Path):
+    """Write the synthetic fixture set (image + expected text) to `directory`."""
+    fixtures = [
+        ("photo_label_12mp", (4000, 3000), (214, 204, 180), (40, 35, 30), CLAIMS, 90, 25, 1.2, 1.8),
+        ("tall_label", (3000, 4500), (250, 248, 240), (30, 30, 30), CLAIMS, 80, 10, 0.0, 9.0),
+        ("dark_label", (2400, 1600), (25, 45, 30), (235, 235, 225), CLAIMS[:3], 64, 0, 0.0, 1.8),
+        ("mostly_blank_photo", (4000, 3000), (245, 245, 245), (20, 20, 20), CLAIMS[4:5], 80, 10, 0.0, 1.8),
+        ("screenshot", (1200, 500), (255, 255, 255), (0, 0, 0), CLAIMS[:2], 28, 0, 0.0, 1.8),
+    ]
+    for name, size, background, ink, lines, font_size, noise, blur, spacing in fixtures:
+        image = _label(size, background, ink, lines, font_size, noise, blur, spacing)
+        image.save(directory / f"{name}.jpg", quality=90)
+        (directory / f"{name}.txt").write_text("\n".join(lines))
+
+def _words(text: str):
+    return re.findall(r"[a-z0-9%]+", text.lower())
+
+def accuracy(expected: str, actual: str) -> dict:
+    """Character similarity and share of expected words recovered."""
+    expected_words, actual_words = _words(expected), _words(actual)
+    found = set(actual_words)
+    return {
+        "char_similarity": difflib.SequenceMatcher(
+            None, " ".join(expected_words), " ".join(actual_words)
+        ).ratio(),
+        "word_recall": sum(w in found for w in expected_words) / max(1, len(expected_words)),
+    }
+
+def tiles(path: Path) -> int:
+    """Number of pieces ocr.ocr_image recognises separately."""
+    image = ocr.prepare_image(Image.open(path))
+    if image.width * image.height < ocr.TILE_MIN_PIXELS:
+        return 1 if ocr.text_bands(image) else 0
+    return len(ocr.text_bands(image))
+
+def baseline(path: Path) -> str:
+    return pytesseract.image_to_string(Image.open(path)).strip()
+
+def pipeline(path: Path) -> str:
+    return ocr.ocr_image(Image.open(path))
+
+def measure(fn, path: Path, runs: int) -> dict:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = fn(path)
+        times.append(time.perf_counter() - started)
+    return {"median_seconds": statistics.median(times), "text": text}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", help="Directory of images with .txt ground truth")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(args.fixtures) if args.fixtures else Path(tmp)
+        if not args.fixtures:
+            make_fixtures(directory)
+        results = []
+        for path in sorted(p for p in directory.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES):
+            truth_path = path.with_suffix(".txt")
+            expected = truth_path.read_text() if truth_path.exists() else ""
+            width, height = Image.open(path).size
+            row = {"fixture": path.name, "megapixels": round(width * height / 1e6, 1),
+                   "tiles": tiles(path)}
+            for label, fn in [("baseline", baseline), ("pipeline", pipeline)]:
+                outcome = measure(fn, path, args.runs)
+                row[label] = {"median_seconds": round(outcome["median_seconds"], 3)}
+                row[label].update({k: round(v, 3) for k, v in accuracy(expected, outcome["text"]).items()})
+            results.append(row)
+            print(json.dumps(row))
+
+    summary = {"fixtures": results}
+    for label in ("baseline", "pipeline"):
+        summary[label] = {
+            "total_seconds": round(sum(r[label]["median_seconds"] for r in results), 3),
+            "mean_word_recall": round(statistics.mean(r[label]["word_recall"] for r in results), 3),
+            "mean_char_similarity": round(
+                statistics.mean(r[label]["char_similarity"] for r in results), 3),
+        }
+    print(json.dumps({k: v for k, v in summary.items() if k != "fixtures"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
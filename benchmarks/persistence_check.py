@@ -0,0 +1,181 @@
+"""
+Checks of write-behind persistence against a local Supabase stand-in.
+
+PersistenceWorker and supabase_writer run against FakeSupabase from
+fake_services.py, through the real Supabase client, so no keys or network
+are needed. Checks:
+
+    batching    rows queued together go out in batches of `batch_size`
+    retries     failed writes are retried and then succeed
+    give_up     a batch that keeps failing is dropped and counted
+    shutdown    rows still queued at shutdown are flushed first
+    round_trip  ConversationLog.new_rows over two saves, read back with
+                load_conversation, gives the same messages
+
+Each check prints what it saw; the script exits non-zero if any failed.
+
+    python benchmarks/persistence_check.py
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeSupabase  # noqa: E402
+from conversation_store import (  # noqa: E402
+    ATTACHMENTS_TABLE, MESSAGES_TABLE, ConversationLog, attachment_meta, attachment_texts,
+    load_conversation, user_content,
+)
+from persistence import PersistenceWorker, supabase_writer  # noqa: E402
+
+TABLE = "checks"
+REPORT = "Our bottles are 100% recyclable and made from plant based plastic. " * 40
+
+
+def make_worker(client, **kwargs) -> PersistenceWorker:
+    write = supabase_writer(client, {ATTACHMENTS_TABLE: "hash"})
+    kwargs.setdefault("batch_wait", 0.2)
+    kwargs.setdefault("backoff", 0.01)
+    return PersistenceWorker(write, **kwargs)
+
+def check_batching(service, client) -> dict:
+    worker = make_worker(client, batch_size=10)
+    writes = service.writes
+    for i in range(25):
+        worker.submit(TABLE, {"id": f"batch-{i}"})
+    flushed = worker.flush(timeout=10)
+    stored = [r for r in service.rows.get(TABLE, []) if r["id"].startswith("batch-")]
+    result = {"flushed": flushed, "writes": service.writes - writes, "rows": len(stored),
+              "written": worker.stats()["written"]}
+    result["ok"] = flushed and result["writes"] == 3 and result["rows"] == result["written"] == 25
+    worker.shutdown()
+    return result
+
+def check_retries(service, client) -> dict:
+    worker = make_worker(client)
+    service.fail_writes = 2
+    worker.submit(TABLE, {"id": "retry"})
+    flushed = worker.flush(timeout=10)
+    stats = worker.stats()
+    stored = [r for r in service.rows.get(TABLE, []) if r["id"] == "retry"]
+    result = {"flushed": flushed, "retries": stats["retries"], "written": stats["written"],
+              "rows": len(stored)}
+    result["ok"] = flushed and stats["retries"] == 2 and stats["written"] == 1 and len(stored) == 1
+    worker.shutdown()
+    return result
+
+def check_give_up(service, client) -> dict:
+    worker = make_worker(client, max_retries=2)
+    service.fail_writes = 3
+    worker.submit(TABLE, {"id": "dropped"})
+    flushed = worker.flush(timeout=10)
+    stats = worker.stats()
+    stored = [r for r in service.rows.get(TABLE, []) if r["id"] == "dropped"]
+    result = {"flushed": flushed, "retries": stats["retries"], "failed": stats["failed"],
+              "rows": len(stored)}
+    result["ok"] = flushed and stats["retries"] == 2 and stats["failed"] == 1 and not stored
+    service.fail_writes = 0
+    worker.shutdown()
+    return result
+
+def check_shutdown(service, client) -> dict:
+    # Shut down while the rows are still waiting for the rest of their batch
+    worker = make_worker(client, batch_wait=1.0)
+    for i in range(5):
+        worker.submit(TABLE, {"id": f"shutdown-{i}"})
+    started = time.perf_counter()
+    worker.shutdown(timeout=60)
+    stored = [r for r in service.rows.get(TABLE, []) if r["id"].startswith("shutdown-")]
+    result = {"rows": len(stored), "depth": worker.depth(),
+              "seconds": round(time.perf_counter() - started, 3)}
+    result["ok"] = len(stored) == 5 and worker.depth() == 0
+    return result
+
+def check_round_trip(service, client) -> dict:
+    worker = make_worker(client)
+    note = "Carbon neutral since 2020."
+    first = [
+        {"role": "user", "content": "Hello"},
+        {"role": "assistant", "content": "Hi! How can I help?"},
+    ]
+    # One attachment inline in the message, one held in an attachment store
+    attachments = [attachment_meta("note.txt", note), attachment_meta("report.pdf", REPORT, stored=True)]
+    texts = [note, REPORT]
+    first.append({"role": "user", "text": "Check these", "attachments": attachments,
+                  "content": user_content("Check these", attachments, texts)})
+    store = {a["hash"]: text for a, text in zip(attachments, texts)}
+    messages = first + [
+        {"role": "assistant", "content": "The report makes three claims."},
+        {"role": "user", "text": "Again", "attachments": attachments[1:],
+         "content": user_content("Again", attachments[1:], texts[1:])},
+    ]
+
+    log = ConversationLog()
+    other = ConversationLog()
+    saves = [log.new_rows(first, load=store.get), log.new_rows(messages, load=store.get),
+             other.new_rows(first[:1])]
+    for rows in saves:
+        for table, row in rows:
+            worker.submit(table, row)
+    flushed = worker.flush(timeout=10)
+    worker.shutdown()
+
+    loaded = load_conversation(client, log.conversation_id)
+    same = len(loaded) == len(messages) and all(
+        (got["role"] == want["role"] and got.get("text") == want.get("text")
+         and attachment_texts(got) == attachment_texts(want, store.get))
+        if "attachments" in want else got == want
+        for got, want in zip(loaded, messages)
+    )
+    blobs = [row for table, row in saves[1] if table == ATTACHMENTS_TABLE]
+    result = {
+        "flushed": flushed,
+        "rows_per_save": [len(rows) for rows in saves],
+        "blobs_on_second_save": len(blobs),
+        "messages_loaded": len(loaded),
+        "other_conversation_loaded": len(load_conversation(client, other.conversation_id)),
+        "same_messages": same,
+        "stored_blobs": len(service.rows.get(ATTACHMENTS_TABLE, [])),
+        "stored_messages": len(service.rows.get(MESSAGES_TABLE, [])),
+    }
+    result["ok"] = (flushed and same and not blobs and result["stored_blobs"] == 2
+                    and result["other_conversation_loaded"] == 1)
+    return result
+
+CHECKS = {
+    "batching": check_batching,
+    "retries": check_retries,
+    "give_up": check_give_up,
+    "shutdown": check_shutdown,
+    "round_trip": check_round_trip,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=list(CHECKS))
+    parser.add_argument("--write-delay", type=float, default=0.02,
+                        help="Seconds the stand-in takes per write")
+    args = parser.parse_args()
+
+    from supabase import create_client
+
+    service = FakeSupabase(args.write_delay)
+    client = create_client(service.url, FakeSupabase.KEY)
+    results = {}
+    try:
+        for name in args.checks:
+            results[name] = CHECKS[name](service, client)
+            print(json.dumps({name: results[name]}))
+    finally:
+        service.close()
+    failed = [name for name, result in results.items() if not result["ok"]]
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
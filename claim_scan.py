@@ -0,0 +1,216 @@
+"""
+Local pre-screen for environmental claims in uploaded documents.
+
+A long report usually mentions its green credentials in a handful of
+places. An Aho-Corasick automaton built from a lexicon of claim terms
+("carbon neutral", "eco-friendly", "recyclable", ...) finds them all in
+one pass over the text; each hit is widened to its sentence plus some
+context, and overlapping spans are merged. Together with an outline of
+the document's headings, these spans are what the model is shown on the
+turn a file is uploaded, instead of the opening pages.
+
+The lexicon can be replaced with a file of terms, one per line, named by
+the GWRR_CLAIM_LEXICON environment variable.
+"""
+import os
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from tokens import count_tokens
+
+CONTEXT_CHARS = 160       # Context kept around a claim, extended to sentence ends
+MAX_SPAN_CHARS = 1200
+OUTLINE_ITEMS = 24
+MAX_HEADING_CHARS = 80
+
+LEXICON = [
+    # Climate
+    "carbon neutral", "carbon-neutral", "climate neutral", "climate positive",
+    "net zero", "net-zero", "zero emissions", "zero-emission", "low carbon",
+    "low-carbon", "carbon footprint", "carbon offset", "offset", "offsets",
+    "carbon negative", "co2", "greenhouse gas", "emissions",
+    # Materials and waste
+    "recyclable", "recycled", "recycling", "compostable", "biodegradable",
+    "plastic-free", "plastic free", "zero waste", "zero-waste", "reusable",
+    "refillable", "plant-based", "plant based", "bio-based", "ocean plastic",
+    # General environmental wording
+    "eco-friendly", "eco friendly", "environmentally friendly", "sustainable",
+    "sustainably", "sustainability", "green", "natural", "non-toxic",
+    "clean energy", "renewable", "renewable energy", "nature positive",
+    "planet friendly", "earth friendly", "responsibly sourced", "ethically sourced",
+    "organic", "chemical-free", "chemical free", "deforestation-free",
+    # Certification and comparison
+    "certified", "fsc", "b corp", "cradle to cradle", "carbon trust",
+    "better for the planet", "kinder to the planet", "less plastic", "less packaging",
+]
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s)|\n\s*\n")
+_NUMBERED = re.compile(r"^(\d+(\.\d+)*|[ivxlc]+\.|[a-z]\))\s+\S", re.IGNORECASE)
+
+
+class ClaimMatcher:
+    """Aho-Corasick automaton over lower-cased lexicon terms."""
+
+    def __init__(self, terms: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[str, ...]] = [()]
+        for term in {t.strip().lower() for t in terms if t.strip()}:
+            state = 0
+            for ch in term:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = nxt
+            self.output[state] += (term,)
+
+        # Breadth-first, so every state's fail link is set before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                link = self.fail[state]
+                while link and ch not in self.goto[link]:
+                    link = self.fail[link]
+                self.fail[child] = self.goto[link].get(ch, 0)
+                self.output[child] += self.output[self.fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, term) for every whole-word occurrence in `text`."""
+        goto, fail, output = self.goto, self.fail, self.output
+        lowered = text.lower()
+        hits = []
+        state = 0
+        for i, ch in enumerate(lowered):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for term in output[state]:
+                    start = i + 1 - len(term)
+                    if _is_word_edge(lowered, start - 1) and _is_word_edge(lowered, i + 1):
+                        hits.append((start, i + 1, term))
+        return hits
+
+def _is_word_edge(text: str, i: int) -> bool:
+    return i < 0 or i >= len(text) or not text[i].isalnum()
+
+
+class ClaimSpan(NamedTuple):
+    """Text around one or more claim terms, with the heading it falls under."""
+    start: int
+    end: int
+    terms: Tuple[str, ...]
+    section: str
+    text: str
+
+
+class ClaimReport(NamedTuple):
+    name: str
+    outline: List[str]
+    spans: List[ClaimSpan]
+    chars: int
+
+
+def _sentence_bounds(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Widen [start, end) by CONTEXT_CHARS each way, then out to sentence ends."""
+    left = max(0, start - CONTEXT_CHARS)
+    ends = list(_SENTENCE_END.finditer(text, left, start))
+    left = ends[-1].end() if ends else max(0, start - CONTEXT_CHARS * 2)
+    right = min(len(text), end + CONTEXT_CHARS)
+    found = _SENTENCE_END.search(text, right, min(len(text), right + CONTEXT_CHARS))
+    right = found.end() if found else min(len(text), right + CONTEXT_CHARS)
+    return left, right
+
+def _is_heading(line: str) -> bool:
+    if not line or len(line) > MAX_HEADING_CHARS or line[-1] in ".,;:":
+        return False
+    if _NUMBERED.match(line):
+        return True
+    words = [w for w in line.split() if w[0].isalpha()]
+    return bool(words) and (line.isupper() or all(w[0].isupper() for w in words)) and len(words) <= 10
+
+def outline(text: str) -> List[Tuple[int, str]]:
+    """(offset, heading) pairs for lines that look like headings."""
+    headings = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if _is_heading(stripped) and (not headings or headings[-1][1] != stripped):
+            headings.append((offset, stripped))
+        offset += len(line)
+    return headings
+
+
+class ClaimScanner:
+    """Finds claim spans and an outline in extracted document text."""
+
+    def __init__(self, terms: Iterable[str] = None):
+        self.matcher = ClaimMatcher(terms or load_lexicon())
+
+    def scan(self, name: str, text: str) -> ClaimReport:
+        headings = outline(text)
+        spans = []
+        for start, end, term in self.matcher.find(text):
+            left, right = _sentence_bounds(text, start, end)
+            if spans and left <= spans[-1][1] and right - spans[-1][0] <= MAX_SPAN_CHARS:
+                prev_left, prev_right, terms, first = spans[-1]
+                spans[-1] = (prev_left, max(prev_right, right), terms | {term}, first)
+            else:
+                spans.append((left, right, {term}, start))
+
+        claims = []
+        h = 0
+        for left, right, terms, first in spans:
+            # The section is the one the first claim term falls under
+            while h < len(headings) and headings[h][0] <= first:
+                h += 1
+            section = headings[h - 1][1] if h else ""
+            snippet = " ".join(text[left:right].split())
+            claims.append(ClaimSpan(left, right, tuple(sorted(terms)), section, snippet))
+        return ClaimReport(name, [heading for _, heading in headings], claims, len(text))
+
+
+def load_lexicon() -> List[str]:
+    """Terms from the GWRR_CLAIM_LEXICON file if set, else the built-in LEXICON."""
+    path = os.environ.get("GWRR_CLAIM_LEXICON")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return LEXICON
+
+def format_claims(report: ClaimReport, budget_tokens: int) -> str:
+    """
+    Outline and claim spans of one document for the prompt, within
+    `budget_tokens`. Spans with the most distinct claim terms come first
+    when they don't all fit, but are shown in document order.
+    """
+    header = (f"Pre-screen of {report.name} ({report.chars:,} characters): "
+              f"{len(report.spans)} passages with environmental claims.")
+    parts = [header]
+    if report.outline:
+        parts.append("Outline: " + " | ".join(report.outline[:OUTLINE_ITEMS]))
+    used = count_tokens("\n\n".join(parts))
+
+    ranked = sorted(range(len(report.spans)), key=lambda i: (-len(report.spans[i].terms), i))
+    chosen = []
+    for i in ranked:
+        span = report.spans[i]
+        cost = count_tokens(span.text) + 12
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(i)
+        used += cost
+    for i in sorted(chosen):
+        span = report.spans[i]
+        label = f"[{span.section}] " if span.section else ""
+        parts.append(f"{label}{span.text}\n(claims: {', '.join(span.terms)})")
+    if len(chosen) < len(report.spans):
+        parts.append(f"({len(report.spans) - len(chosen)} more claim passages not shown.)")
+    return "\n\n".join(parts)
@@ -0,0 +1,177 @@
+"""
+Append-only conversation storage.
+
+Each session has one stable conversation id, and every save appends only
+the messages added since the last one. Extracted attachment text is
+stored once, compressed, under its content hash; messages refer to it by
+hash. Expected tables:
+
+    create table conversation_messages (
+        conversation_id text not null,
+        seq integer not null,
+        role text not null,
+        content text not null,
+        attachments jsonb not null default '[]',
+        created_at timestamptz not null,
+        user_id text,
+        primary key (conversation_id, seq)
+    );
+    create table conversation_attachments (
+        hash text primary key,      -- sha256 of the UTF-8 text
+        data text not null,         -- base64 of zlib-compressed text
+        chars integer not null
+    );
+"""
+import base64
+import hashlib
+import uuid
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+MESSAGES_TABLE = "conversation_messages"
+ATTACHMENTS_TABLE = "conversation_attachments"
+
+
+def new_conversation_id() -> str:
+    """A fresh id for a session's conversation."""
+    return uuid.uuid4().hex
+
+def text_hash(text: str) -> str:
+    """Content hash that attachment blobs are stored under."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def compress_text(text: str) -> str:
+    """Compress text for a text column."""
+    return base64.b64encode(zlib.compress(text.encode("utf-8"))).decode("ascii")
+
+def decompress_text(data: str) -> str:
+    """Inverse of compress_text."""
+    return zlib.decompress(base64.b64decode(data)).decode("utf-8")
+
+# -------------------- User Message Layout -------------------------- #
+def attachment_meta(name: str, text: str, stored: bool = False) -> dict:
+    """
+    Attachment entry for a user message. With `stored`, the text is kept
+    in an attachment store under the hash rather than in the message.
+    """
+    meta = {"name": name, "hash": text_hash(text) if text else None, "chars": len(text)}
+    if stored and text:
+        meta["stored"] = True
+    return meta
+
+def user_content(text: str, attachments: List[dict], texts: List[str]) -> str:
+    """
+    The full content of a user message: the typed text followed by a
+    "File: <name>\\n<extracted text>" block per attachment. Stored
+    attachments get the "File: <name>" line only.
+    """
+    blocks = [text] if text else []
+    for attachment, body in zip(attachments, texts):
+        header = f"File: {attachment['name']}"
+        blocks.append(f"{header}\n{body}" if body and not attachment.get("stored") else header)
+    return "\n\n".join(blocks)
+
+def attachment_texts(msg, load: Callable[[str], Optional[str]] = None) -> List[str]:
+    """
+    Recover each attachment's text from a user message built by
+    user_content. Stored attachments are read with `load(hash)`.
+    """
+    content = msg["content"]
+    pos = len(msg["text"]) + 2 if msg["text"] else 0
+    texts = []
+    for attachment in msg["attachments"]:
+        pos += len(f"File: {attachment['name']}")
+        if attachment.get("stored"):
+            texts.append((load(attachment["hash"]) if load else None) or "")
+        elif attachment.get("chars"):
+            texts.append(content[pos + 1:pos + 1 + attachment["chars"]])
+            pos += 1 + attachment["chars"]
+        else:
+            texts.append("")
+        pos += 2
+    return texts
+
+# ------------------------- Encoding -------------------------------- #
+class ConversationLog:
+    """Tracks what of one session's conversation has been stored already."""
+
+    def __init__(self, conversation_id: str = None, user_id: str = "anonymous_user"):
+        self.conversation_id = conversation_id or new_conversation_id()
+        self.user_id = user_id
+        self.saved = 0          # Messages already handed out as rows
+        self.blobs = set()      # Attachment hashes already handed out
+
+    def new_rows(self, messages: List[dict],
+                 load: Callable[[str], Optional[str]] = None) -> List[Tuple[str, dict]]:
+        """
+        (table, row) pairs for messages added since the last call. Blobs
+        come before the messages that refer to them; texts of stored
+        attachments are read with `load(hash)`.
+        """
+        rows = []
+        created_at = datetime.now().isoformat()
+        for seq in range(self.saved, len(messages)):
+            msg = messages[seq]
+            row = {
+                "conversation_id": self.conversation_id,
+                "seq": seq,
+                "role": msg["role"],
+                "content": msg["content"],
+                "attachments": [],
+                "created_at": created_at,
+                "user_id": self.user_id,
+            }
+            if "attachments" in msg:
+                row["content"] = msg["text"]
+                for attachment, text in zip(msg["attachments"], attachment_texts(msg, load)):
+                    digest = attachment["hash"]
+                    row["attachments"].append({"name": attachment["name"], "hash": digest})
+                    if digest and text and digest not in self.blobs:
+                        rows.append((ATTACHMENTS_TABLE, {
+                            "hash": digest,
+                            "data": compress_text(text),
+                            "chars": len(text),
+                        }))
+                        self.blobs.add(digest)
+            rows.append((MESSAGES_TABLE, row))
+        self.saved = len(messages)
+        return rows
+
+# ------------------------- Reading --------------------------------- #
+def decode_message(row: dict, blobs: Dict[str, str]) -> dict:
+    """Rebuild a session message from a stored row and its attachment texts."""
+    if not row.get("attachments"):
+        return {"role": row["role"], "content": row["content"]}
+    texts = [blobs.get(a["hash"], "") if a["hash"] else "" for a in row["attachments"]]
+    attachments = [attachment_meta(a["name"], text) for a, text in zip(row["attachments"], texts)]
+    return {
+        "role": row["role"],
+        "content": user_content(row["content"], attachments, texts),
+        "text": row["content"],
+        "attachments": attachments,
+    }
+
+def load_conversation(client, conversation_id: str) -> List[dict]:
+    """Read a stored conversation back as the full list of session messages."""
+    rows = (
+        client.table(MESSAGES_TABLE)
+        .select("*")
+        .eq("conversation_id", conversation_id)
+        .order("seq")
+        .execute()
+        .data
+    )
+    hashes = sorted({
+        a["hash"] for row in rows for a in (row.get("attachments") or []) if a["hash"]
+    })
+    blobs = {}
+    if hashes:
+        resp = (
+            client.table(ATTACHMENTS_TABLE)
+            .select("hash,data")
+            .in_("hash", hashes)
+            .execute()
+        )
+        blobs = {blob["hash"]: decompress_text(blob["data"]) for blob in resp.data}
+    return [decode_message(row, blobs) for row in rows]
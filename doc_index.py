@@ -0,0 +1,168 @@
+"""
+Per-session retrieval over uploaded documents.
+
+Extracted text is split into overlapping word windows and kept in an
+inverted index. Each question is ranked against it with BM25, and only
+the best passages that fit a token budget are put in the prompt, so the
+full text of earlier uploads is never resent. With an AttachmentStore,
+the index keeps only offsets into the stored text, not the text itself.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import List, NamedTuple, Tuple
+
+from conversation_store import text_hash
+from tokens import CHARS_PER_TOKEN
+
+CHUNK_WORDS = 180
+CHUNK_OVERLAP_WORDS = 30
+BM25_K1 = 1.5
+BM25_B = 0.75
+POSTING_BYTES = 64     # Rough memory per index entry, for memory gauges
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+_TOKEN_RE = re.compile(r"\S+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i in is it its "
+    "me my of on or our so that the their them there these they this to was we "
+    "what when which who why will with you your".split()
+)
+
+
+class Passage(NamedTuple):
+    """A chunk of a document, numbered from 1 within that document."""
+    name: str
+    number: int
+    text: str
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased index terms of `text`, without stopwords."""
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+def chunk_spans(text: str, size: int = CHUNK_WORDS,
+                overlap: int = CHUNK_OVERLAP_WORDS) -> List[Tuple[int, int]]:
+    """(start, end) offsets of windows of `size` words that overlap by `overlap` words."""
+    words = [(m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    spans = []
+    for start in range(0, len(words), step):
+        spans.append((words[start][0], words[min(start + size, len(words)) - 1][1]))
+        if start + size >= len(words):
+            break
+    return spans
+
+def passage_text(text: str) -> str:
+    """A passage as shown to the model, with whitespace collapsed."""
+    return " ".join(text.split())
+
+
+class DocumentIndex:
+    """BM25 index over the passages of every document in a session."""
+
+    def __init__(self, store=None, session: str = ""):
+        self.store = store                  # AttachmentStore holding document text, if any
+        self.session = session
+        self.clear()
+
+    def clear(self):
+        """Forget every document."""
+        self.passages = []                  # passage id -> (name, number, text hash, start, end)
+        self.lengths = []                   # passage id -> term count
+        self.postings = defaultdict(dict)   # term -> {passage id: term frequency}
+        self.documents = {}                 # (name, text hash) -> passage ids
+        self._texts = {}                    # text hash -> text, without a store
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.passages)
+
+    def add_document(self, name: str, text: str) -> List[int]:
+        """Index a document's passages; re-adding identical text is a no-op."""
+        digest = text_hash(text)
+        key = (name, digest)
+        if key in self.documents:
+            return self.documents[key]
+        if self.store is not None:
+            self.store.put(self.session, text)
+        else:
+            self._texts[digest] = text
+        ids = []
+        for number, (start, end) in enumerate(chunk_spans(text), start=1):
+            pid = len(self.passages)
+            terms = Counter(tokenize(text[start:end]))
+            self.passages.append((name, number, digest, start, end))
+            self.lengths.append(sum(terms.values()))
+            self._total_length += self.lengths[-1]
+            for term, tf in terms.items():
+                self.postings[term][pid] = tf
+            ids.append(pid)
+        self.documents[key] = ids
+        return ids
+
+    def passage(self, pid: int) -> Passage:
+        """A passage with its text, read from the store if there is one."""
+        name, number, digest, start, end = self.passages[pid]
+        if self.store is not None:
+            text = self.store.get(self.session, digest) or ""
+        else:
+            text = self._texts[digest]
+        return Passage(name, number, passage_text(text[start:end]))
+
+    def memory_bytes(self) -> int:
+        """Rough size of the index and any text it holds itself."""
+        entries = len(self.passages) + sum(len(p) for p in self.postings.values())
+        return entries * POSTING_BYTES + sum(len(t) for t in self._texts.values())
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """Passage ids ranked by BM25 score for `query`, best first."""
+        if not self.passages:
+            return []
+        n = len(self.passages)
+        avg_length = self._total_length / n or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pid, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[pid] / avg_length)
+                scores[pid] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+        return ranked[:limit]
+
+    def select(self, query: str, budget_tokens: int, names=None) -> List[Passage]:
+        """
+        Best passages for `query` that fit within `budget_tokens`.
+        Without query terms to rank by, the opening passages of the
+        documents in `names` (or of every document) are used instead.
+        """
+        ranked = self.search(query, limit=len(self.passages))
+        if not ranked:
+            ranked = [
+                pid for pid, passage in enumerate(self.passages)
+                if names is None or passage[0] in names
+            ]
+        chosen = []
+        used = 0
+        for pid in ranked:
+            # Estimated from the span, so only chosen passages are read
+            _, _, _, start, end = self.passages[pid]
+            cost = (end - start) // CHARS_PER_TOKEN + 1
+            if used + cost > budget_tokens:
+                continue
+            passage = self.passage(pid)
+            if passage.text:
+                chosen.append(passage)
+                used += cost
+        return chosen
+
+
+def format_passages(passages: List[Passage]) -> str:
+    """Render passages for the prompt, each labelled with its file name."""
+    blocks = [f"[{p.name}, excerpt {p.number}]\n{p.text}" for p in passages]
+    return "Relevant excerpts from the uploaded files:\n\n" + "\n\n".join(blocks)
@@ -0,0 +1,117 @@
+"""
+Content-addressed cache for extracted document text.
+
+Entries are keyed by a hash of the file bytes plus the parser version, so
+the same report uploaded again (in any session) skips parsing and OCR.
+A bounded in-memory LRU sits in front of an optional on-disk tier.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(data: bytes, kind: str, version: str) -> str:
+    """Key for a file's extracted text under a given parser and version."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{kind}-{version}-{digest}"
+
+
+class ExtractionCache:
+    """Thread-safe LRU of extracted text with an optional disk tier."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for `key`, or None on a miss."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+        text = self._read_disk(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, text)
+        return text
+
+    def put(self, key: str, text: str):
+        """Store extracted text in memory and, if configured, on disk."""
+        with self._lock:
+            self._remember(key, text)
+        self._write_disk(key, text)
+
+    def stats(self) -> dict:
+        """Counters and current size, for display or export."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _remember(self, key: str, text: str):
+        size = len(text)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = text
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.txt.gz")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Extraction cache read error: {e}")
+            return None
+
+    def _write_disk(self, key: str, text: str):
+        if not self.disk_dir:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            print(f"Extraction cache write error: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
@@ -0,0 +1,102 @@
+"""
+Rolling compaction of the chat history sent to the model.
+
+Token counts are computed once per message as the conversation grows.
+When the prompt would exceed its budget, the oldest turns are folded into
+a running summary and only the most recent exchanges are kept verbatim,
+so prompt size stays roughly flat however long a session runs.
+"""
+from typing import Callable, List
+
+from tokens import CHARS_PER_TOKEN, count_message_tokens
+
+KEEP_RECENT = 6          # Messages kept verbatim (about three exchanges)
+COMPACT_TO = 0.6         # Fold down to this share of the budget, so it happens rarely
+SUMMARY_SHARE = 0.2      # Most of the budget the running summary may take
+EXTRACT_CHARS = 300      # Per-message excerpt length for the fallback summary
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def extractive_summary(summary: str, messages: List[dict]) -> str:
+    """Fallback summary: the previous one plus the start of each folded message."""
+    lines = [summary] if summary else []
+    for msg in messages:
+        excerpt = " ".join(msg["content"].split())[:EXTRACT_CHARS]
+        lines.append(f"{msg['role'].capitalize()}: {excerpt}")
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """
+    Keeps the prompt history of one session within `budget` tokens.
+
+    `summarize(summary, messages)` folds older messages into the running
+    summary and returns the new summary text; it is only called when the
+    budget is exceeded.
+    """
+
+    def __init__(self, budget: int, summarize: Callable[[str, List[dict]], str], keep_recent: int = KEEP_RECENT):
+        self.budget = budget
+        self.summarize = summarize
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.folded = 0       # Leading messages already folded into the summary
+        self.counts = []      # Cached token count per message
+        self._live = 0        # Tokens in messages[folded:]
+
+    def tokens(self) -> int:
+        """Tokens the compacted history currently takes up."""
+        return self._live + self._summary_tokens()
+
+    def compact(self, messages: List[dict]) -> List[dict]:
+        """
+        Return the messages to send: the running summary, if any, followed
+        by every message not yet folded into it. `messages` must only ever
+        grow between calls, as the session transcript does.
+        """
+        for msg in messages[len(self.counts):]:
+            self.counts.append(count_message_tokens(msg))
+            self._live += self.counts[-1]
+
+        if self.tokens() > self.budget:
+            self._fold(messages)
+
+        recent = messages[self.folded:]
+        if not self.summary:
+            return list(recent)
+        return [{"role": "system", "content": SUMMARY_PREFIX + self.summary}] + recent
+
+    def _summary_tokens(self) -> int:
+        if not self.summary:
+            return 0
+        return count_message_tokens({"content": SUMMARY_PREFIX + self.summary})
+
+    def _fold(self, messages: List[dict]):
+        summary_max = int(self.budget * SUMMARY_SHARE)
+        target = int(self.budget * COMPACT_TO) - summary_max
+        oldest_kept = len(messages) - min(self.keep_recent, len(messages))
+        cut = self.folded
+        live = self._live
+        # Fold oldest-first until the rest fits the target, keeping the recent
+        # exchanges verbatim...
+        while cut < oldest_kept and live > target:
+            live -= self.counts[cut]
+            cut += 1
+        # ...unless they alone break the hard budget; the latest message stays.
+        while cut < len(messages) - 1 and live > self.budget - summary_max:
+            live -= self.counts[cut]
+            cut += 1
+        if cut == self.folded:
+            return
+
+        folding = messages[self.folded:cut]
+        try:
+            summary = self.summarize(self.summary, folding)
+        except Exception as e:
+            print(f"Summary error: {e}")
+            summary = ""
+        if not summary:
+            summary = extractive_summary(self.summary, folding)
+        self.summary = summary[-summary_max * CHARS_PER_TOKEN:]
+        self.folded = cut
+        self._live = live
@@ -0,0 +1,334 @@
+"""
+Parallel, page-level extraction of uploaded documents.
+
+PDF pages and images are spread across a shared process pool so that
+ingest time scales with the number of cores instead of the total page
+count. In `extract_files`, each PDF is read as a stream of page ranges fed
+to the pool a few at a time; pages are released in order and the file's
+remaining ranges are dropped once its character budget is reached, so
+time and memory depend on the budget rather than the page count.
+Pages without a text layer (scans) are OCR'd from their images.
+
+Everything in here is free of Streamlit so the workers can be pickled
+into child processes; the app turns the per-file errors into the usual
+warnings.
+"""
+import atexit
+import io
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from extraction_cache import cache_key
+
+PARSER_VERSION = "4"  # Bump when extraction output changes, to invalidate caches
+MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+MAX_IN_FLIGHT = MAX_WORKERS * 2  # Tasks queued on the pool at once
+PDF_PAGES_PER_TASK = 4
+CHAR_BUDGET = 400_000  # Text kept per file (~100k tokens); reading stops here
+MIN_TEXT_LAYER_CHARS = 16  # Pages with less extractable text than this get OCR
+
+PDF_EXTENSIONS = (".pdf",)
+TEXT_EXTENSIONS = (".txt",)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class Extraction(NamedTuple):
+    """Outcome of extracting one file: its text, or why it failed."""
+    name: str
+    text: str
+    error: Optional[str] = None
+
+
+def file_kind(name: str) -> Optional[str]:
+    """Return "pdf", "text" or "image" for a supported file name, else None."""
+    name_lower = name.lower()
+    if name_lower.endswith(PDF_EXTENSIONS):
+        return "pdf"
+    if name_lower.endswith(TEXT_EXTENSIONS):
+        return "text"
+    if name_lower.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    return None
+
+# ---------------------- Worker Functions --------------------------- #
+def pdf_page_count(data: bytes) -> int:
+    """Number of pages in a PDF; only the cross-reference table is parsed."""
+    from PyPDF2 import PdfReader
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+def _ocr_page_images(page) -> str:
+    """OCR the images embedded in a page, e.g. the scan of a scanned page."""
+    texts = []
+    try:
+        for image in page.images:
+            texts.append(parse_image(image.data))
+    except Exception as e:
+        print(f"OCR fallback error: {e}")
+    return "\n".join(t for t in texts if t)
+
+def parse_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    """Extract text from pages [start, stop) of a PDF file, OCR'ing scanned pages."""
+    from PyPDF2 import PdfReader
+    texts = []
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        for i in range(start, stop):
+            page = reader.pages[i]
+            text = page.extract_text() or ""
+            if len(text.strip()) < MIN_TEXT_LAYER_CHARS:
+                text = _ocr_page_images(page) or text
+            texts.append(text)
+    return texts
+
+def parse_text(data: bytes) -> str:
+    """Decode a text file."""
+    return data.decode("utf-8", errors="ignore")
+
+def parse_image(data: bytes) -> str:
+    """OCR an image. Tesseract must be installed on the system."""
+    from PIL import Image
+    from ocr import ocr_image
+    return ocr_image(Image.open(io.BytesIO(data)))
+
+def _timed(fn, *args):
+    """Run a worker function, returning (seconds taken, result)."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+# ------------------------ Process Pool ----------------------------- #
+_executor = None
+_executor_lock = threading.Lock()
+
+class _WorkerProcess(multiprocessing.context.ForkServerProcess):
+    """
+    Forkserver process that starts without re-running `__main__`. Under
+    Streamlit that is the app script, which would draw the page and read
+    secrets in every worker; the workers only need this module.
+    """
+    def start(self):
+        script = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            super().start()
+        finally:
+            sys.modules["__main__"] = script
+
+class _WorkerContext(multiprocessing.context.ForkServerContext):
+    Process = _WorkerProcess
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Process-wide pool shared by every session. Workers start from a clean
+    forkserver process: forking Streamlit's threaded server directly can
+    copy locks held by other threads and deadlock the child.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=_WorkerContext())
+        return _executor
+
+def shutdown_executor():
+    """Stop the worker processes (registered at interpreter exit)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+atexit.register(shutdown_executor)
+
+# ------------------------- Scheduling ------------------------------ #
+def _spool(data: bytes) -> str:
+    """
+    Write a PDF to a temporary file for the workers to read pages from,
+    rather than pickling the whole document into every task.
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+class _Scheduler:
+    """
+    Feeds tasks to the pool a window at a time, so work for a file can be
+    dropped (e.g. once its budget is met) before it is ever submitted.
+    """
+
+    def __init__(self, executor, window: int = MAX_IN_FLIGHT):
+        self.executor = executor
+        self.window = window
+        self.pending = deque()  # (key, fn, args) not yet submitted
+        self.running = {}       # future -> key
+
+    def add(self, key, fn, *args):
+        self.pending.append((key, fn, args))
+
+    def drop(self, idx):
+        """Forget every task whose key starts with file index `idx`."""
+        self.pending = deque(t for t in self.pending if t[0][0] != idx)
+        for future, key in list(self.running.items()):
+            if key[0] == idx:
+                future.cancel()
+                del self.running[future]
+
+    def completed(self) -> Iterator[tuple]:
+        """Yield (key, future) as tasks finish."""
+        while self.pending or self.running:
+            while self.pending and len(self.running) < self.window:
+                key, fn, args = self.pending.popleft()
+                self.running[self.executor.submit(fn, *args)] = key
+            done, _ = wait(list(self.running), return_when=FIRST_COMPLETED)
+            for future in done:
+                key = self.running.pop(future, None)
+                if key is not None:
+                    yield key, future
+
+def _pdf_ranges(count: int) -> List[Tuple[int, int]]:
+    """Split `count` pages into ranges of up to PDF_PAGES_PER_TASK pages."""
+    size = min(PDF_PAGES_PER_TASK, max(1, math.ceil(count / MAX_WORKERS)))
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+class _PdfStream:
+    """Page ranges of one PDF, released in page order up to the budget."""
+
+    def __init__(self, count: int, char_budget: int):
+        self.ranges = _pdf_ranges(count)
+        self.done = {}          # range index -> page texts
+        self.next = 0           # first range not yet released
+        self.chars = 0
+        self.char_budget = char_budget
+
+    def add(self, part: int, texts: List[str]) -> List[str]:
+        """Record a finished range; return the pages now releasable in order."""
+        self.done[part] = texts
+        released = []
+        while self.next in self.done and not self.full():
+            for text in self.done.pop(self.next):
+                if self.full():
+                    break
+                text = text[:self.char_budget - self.chars]
+                self.chars += len(text) + 1
+                released.append(text)
+            self.next += 1
+        return released
+
+    def full(self) -> bool:
+        return self.chars >= self.char_budget
+
+    def finished(self) -> bool:
+        return self.full() or self.next == len(self.ranges)
+
+def extract_files(
+    files: List[Tuple[str, bytes]],
+    progress: Optional[Callable[[int, int], None]] = None,
+    executor=None,
+    cache=None,
+    char_budget: int = CHAR_BUDGET,
+    timings: Optional[dict] = None,
+) -> List[Extraction]:
+    """
+    Extract text from (name, data) pairs in parallel.
+
+    Results come back in the same order as `files`, each cut to
+    `char_budget` characters; PDFs stop being read once it is reached.
+    Unsupported types and failed parses are reported through
+    `Extraction.error` rather than raised. `progress(done, total)` is
+    called on the calling thread after each unit of work (a page range or
+    an image) completes. With an `ExtractionCache`, files seen before are
+    answered without parsing and fresh successful extractions are stored.
+    If `timings` is given, worker seconds spent per kind ("pdf", "image")
+    are added to it.
+    """
+    scheduler = _Scheduler(executor or get_executor())
+    results = [Extraction(name, "") for name, _ in files]
+    streams = {}    # file index -> _PdfStream
+    pages = {}      # file index -> released page texts
+    keys = {}       # file index -> cache key, for cache misses only
+    units = {}      # file index -> tasks not yet finished
+    spooled = []    # temporary PDF copies to remove afterwards
+    version = f"{PARSER_VERSION}-{char_budget}"
+
+    for idx, (name, data) in enumerate(files):
+        kind = file_kind(name)
+        if kind is None:
+            results[idx] = Extraction(name, "", "unsupported")
+            continue
+        if cache is not None:
+            key = cache_key(data, kind, version)
+            cached = cache.get(key)
+            if cached is not None:
+                results[idx] = Extraction(name, cached)
+                continue
+            keys[idx] = key
+        if kind == "text":
+            results[idx] = Extraction(name, parse_text(data)[:char_budget])
+        elif kind == "image":
+            scheduler.add((idx, 0), _timed, parse_image, data)
+            units[idx] = 1
+        else:
+            try:
+                streams[idx] = _PdfStream(pdf_page_count(data), char_budget)
+            except Exception as e:
+                results[idx] = Extraction(name, "", f"pdf: {e}")
+                continue
+            pages[idx] = []
+            spooled.append(_spool(data))
+            for part, (start, stop) in enumerate(streams[idx].ranges):
+                scheduler.add((idx, part), _timed, parse_pdf_pages, spooled[-1], start, stop)
+            units[idx] = len(streams[idx].ranges)
+
+    try:
+        total = sum(units.values())
+        done = 0
+        if progress and total:
+            progress(done, total)
+        for (idx, part), future in scheduler.completed():
+            name = files[idx][0]
+            units[idx] -= 1
+            done += 1
+            try:
+                seconds, output = future.result()
+                if timings is not None:
+                    kind = file_kind(name)
+                    timings[kind] = timings.get(kind, 0.0) + seconds
+            except Exception as e:
+                results[idx] = Extraction(name, "", f"{file_kind(name)}: {e}")
+                finished = True
+            else:
+                if idx in streams:
+                    pages[idx].extend(streams[idx].add(part, output))
+                    finished = streams[idx].finished()
+                    if finished:
+                        results[idx] = Extraction(name, "\n".join(pages[idx]))
+                else:
+                    results[idx] = Extraction(name, output[:char_budget])
+                    finished = True
+            if finished:
+                # Work skipped after a budget stop or failure counts as done
+                done += units.pop(idx)
+                scheduler.drop(idx)
+            if progress:
+                progress(done, total)
+    finally:
+        for idx in list(units):
+            scheduler.drop(idx)
+        for path in spooled:
+            os.remove(path)
+
+    for idx, key in keys.items():
+        if results[idx].error is None:
+            cache.put(key, results[idx].text)
+    return results
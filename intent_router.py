@@ -0,0 +1,313 @@
+"""
+Local routing of trivial turns.
+
+Greetings, "what can you do?" and questions unrelated to sustainability
+get fixed answers from the system prompt in prompts.py, so sending them
+to the model only adds a round trip. A small multinomial Naive Bayes
+model over word unigrams and bigrams, trained on the labelled examples
+below, picks an intent for each typed message. It answers from a template
+only when it is confident, the message carries no sustainability or
+organisation vocabulary (including variants such as "composting"), and
+its words fit the intent: greetings and "what can you do?" may not use
+words their examples never did, while an off-topic request may name one
+subject no example mentions, as long as the in-scope examples never
+used it. Everything else goes to the model as before.
+"""
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from claim_scan import LEXICON
+
+MODEL = "model"             # Intent for turns the model should answer
+ROUTE_CONFIDENCE = 0.9      # Posterior needed to answer from a template
+MAX_ROUTED_WORDS = 25       # Longer messages always go to the model
+STEM_CHARS = 6              # Prefix compared when matching other forms of domain words
+OPEN_INTENTS = {"out_of_scope"}  # Intents whose examples can't cover every subject
+MAX_NEW_WORDS = 1           # Words no example used, allowed in an open intent's message
+SMOOTHING = 0.1
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Wording from prompts.prompt1's introduction and out-of-scope rule
+INTRO = (
+    "I am Greenwashing Radar Rover, a friendly AI chatbot designed by Spaceship AI to help "
+    "individuals and organisations avoid greenwashing and adopt truly sustainable practices. "
+    "I can educate you about greenwashing, help assess your sustainability actions, guide you "
+    "in planning ethical strategies, and even review your marketing and communications content "
+    "to ensure it aligns with ethical sustainability principles. My mission is to empower you "
+    "with the tools and knowledge to act responsibly and create genuine, positive environmental "
+    "impacts."
+)
+FUNCTIONS = (
+    "You can ask me to:\n"
+    "- Explain greenwashing and how to avoid it.\n"
+    "- Assess your sustainability efforts or marketing content.\n"
+    "- Help plan ethical, impactful sustainability strategies.\n"
+    "- Help with marketing and communication messaging."
+)
+TEMPLATES = {
+    "greeting": "Hello! 😊 How can I help you with greenwashing or sustainability today?\n\n"
+                + FUNCTIONS,
+    "capabilities": INTRO + "\n\n" + FUNCTIONS,
+    "out_of_scope": "Sorry, that's outside my scope: I can only help with greenwashing and "
+                    "sustainability questions.\n\n" + FUNCTIONS,
+}
+
+TRAINING_EXAMPLES = {
+    "greeting": [
+        "hi", "hello", "hey", "hey there", "hi there", "hello there", "good morning",
+        "good afternoon", "good evening", "hiya", "howdy", "greetings", "yo", "hello rover",
+        "hi rover", "hey bot", "hello again", "hi again", "morning", "evening all",
+        "hey, how are you", "how are you today", "how's it going", "nice to meet you",
+        "hi! how are you doing", "hello, anyone there", "sup", "hey hey", "good day",
+        "hello friend", "hi, nice to meet you", "hey there, how are things",
+    ],
+    "capabilities": [
+        "what can you do", "what do you do", "who are you", "what are you",
+        "what is this app", "how can you help me", "what can you help with",
+        "what are your functions", "tell me about yourself", "introduce yourself",
+        "what is greenwashing radar rover", "what are you for", "how does this work",
+        "what kind of questions can i ask", "what can i ask you", "help",
+        "what are your capabilities", "what services do you offer", "how do i use you",
+        "what's your purpose", "who made you", "what are you able to do",
+        "what should i ask you", "can you explain what you do", "what is your job",
+        "how do you work", "what features do you have", "what are your skills",
+        "list your functions", "what can this bot do",
+    ],
+    "out_of_scope": [
+        "what's the weather like today", "tell me a joke", "who won the football last night",
+        "write me a poem about cats", "what is the capital of france", "how do i bake bread",
+        "recommend a good movie", "what time is it", "solve this maths problem 2x+3=7",
+        "write python code to sort a list", "translate hello into spanish",
+        "what's the best pizza topping", "who is the president of the united states",
+        "how tall is mount everest", "give me a recipe for pasta", "what is the stock price of apple",
+        "help me with my homework on the french revolution", "tell me a story about dragons",
+        "what should i name my dog", "how do i fix my car engine", "play a game with me",
+        "what's the meaning of life", "who wrote hamlet", "book me a flight to london",
+        "what is bitcoin going to do", "write a love letter", "how do i lose weight",
+        "what are the rules of chess", "sing me a song", "how many legs does a spider have",
+        "explain quantum computing", "write a cover letter for a job",
+        "what's a good workout routine", "how do i learn guitar", "tell me about the roman empire",
+        "what is the best smartphone", "how do i make cocktails", "debug my javascript",
+        "what is the population of china", "how many days are in a leap year",
+        "who discovered penicillin", "what is the square root of 144", "convert 10 miles to km",
+        "how do i make pancakes", "what should i cook for dinner", "how long do i boil pasta",
+        "give me a curry recipe", "who won the premier league", "when is the next olympics",
+        "how do i improve my golf swing", "recommend a netflix show", "who is the best singer ever",
+        "suggest a fantasy book", "what's the plot of star wars", "find me cheap flights to paris",
+        "where should i go on holiday", "what's the time difference with new york",
+        "write a function to reverse a string", "why is my code not compiling",
+        "how do i install python", "how do i ask for a pay rise", "help me write a wedding speech",
+        "how do i stop snoring", "what are the symptoms of flu", "should i buy shares in amazon",
+        "is gold a good investment", "tell me a riddle", "let's play a word game",
+        "tell me a funny story", "write a song about summer", "draw me a picture",
+        "how does a rainbow form", "why is the sky blue", "how old is the earth's moon",
+        "what's the capital of australia", "who was the first person on the moon",
+        "how do i train my puppy", "what's the best cat food", "how do i learn french",
+        "what does this word mean in spanish", "how do i tie my shoelaces", "how do i iron a shirt",
+    ],
+    MODEL: [
+        "what is greenwashing", "is eco friendly an acceptable claim",
+        "can we say our packaging is recyclable", "review this marketing copy for greenwashing",
+        "how do i avoid greenwashing in my ads", "is carbon neutral a misleading claim",
+        "what evidence do we need for a sustainability claim", "check my product label claims",
+        "what are the seven sins of greenwashing", "how should we talk about offsets",
+        "is it ok to say 100% natural", "help me plan our sustainability strategy",
+        "what does net zero mean for a small business", "how can we make our claims more specific",
+        "what regulations apply to green claims in the uk", "is biodegradable a risky claim",
+        "rewrite this slogan so it isn't greenwashing", "assess our sustainability report",
+        "what is the green claims code", "how do we substantiate recycled content",
+        "are carbon offsets greenwashing", "what is scope 3", "how do i measure our carbon footprint",
+        "what makes a claim vague", "can we use a leaf logo on our packaging",
+        "should we get b corp certification", "what is a life cycle assessment",
+        "how do we communicate progress honestly", "is plant based packaging better",
+        "what are hidden trade offs", "help with our esg messaging",
+        "our bottles contain ocean plastic, can we say that",
+        "what did the cma say about green claims", "how to avoid greenhushing",
+        "is sustainable too vague a word", "what is the eu green claims directive",
+        "which of these claims is riskiest", "explain the difference between carbon neutral and net zero",
+        "how do we report emissions reductions", "can you check this ad",
+        "ask about deeper analysis of marketing claims",
+        "inquire about alternative sustainable approaches",
+        "request a bullet-point list of green strategies",
+        "tell me more", "can you explain that again", "why is that a problem",
+        "what would you suggest instead", "give me an example", "thanks, and what about the label",
+        "can you summarise that", "what about our website copy", "continue",
+        "what do you think about lab grown meat", "is aluminium better than glass",
+        "how bad is fast fashion", "what is the impact of streaming on emissions",
+        "should we stop using air freight", "what is regenerative farming",
+        "how do crop yields relate to climate change", "what is the cost of switching our fleet to ev",
+        "is hydrogen really clean", "what do you think about electric scooters",
+        "how long should a shirt last", "is second hand better", "what about bamboo",
+        "are tote bags worth it", "is wool sustainable", "how do we reduce food miles",
+        "what is the weather risk to supply chains", "what are the risks of physical climate change",
+        "what do you think about our new logo", "who regulates environmental labels",
+    ],
+}
+
+# Sustainability topics that are in scope however they are phrased, besides
+# the claim lexicon in claim_scan.py. Other forms of the longer words count
+# too: "composting" through "compostable", "greener" through "green".
+TOPIC_TERMS = [
+    # The service itself and follow-ups
+    "greenwash", "greenwashing", "greenhushing", "claim", "claims", "esg", "label", "labels",
+    "packaging", "marketing", "advice", "suggestion", "suggestions", "summarise", "summarize",
+    "strategy", "slogan", "advert", "advertising", "logo",
+    # Climate and pollution
+    "climate", "carbon", "environment", "environmental", "pollution", "pollute", "pollutes",
+    "footprint", "footprints", "emission", "weather", "warming", "methane", "ozone", "smog",
+    "air quality", "toxic", "chemicals", "pesticide", "pesticides", "fertiliser", "fertilizer",
+    # Nature
+    "nature", "planet", "earth", "wildlife", "biodiversity", "species", "bees", "pollinators",
+    "forest", "forests", "rainforest", "deforestation", "trees", "ocean", "oceans", "overfishing",
+    "fishing", "fisheries", "rivers", "soil", "habitat", "ecosystem", "ecosystems",
+    # Food and farming
+    "farm", "farms", "farming", "farmer", "farmers", "agriculture", "crop", "crops", "harvest",
+    "harvests", "food miles", "palm oil", "soy", "beef", "meat", "dairy", "vegan", "vegetarian",
+    "livestock", "food waste",
+    # Energy and transport
+    "energy", "electricity", "power", "solar", "wind", "hydro", "hydropower", "nuclear",
+    "hydrogen", "gas", "oil", "coal", "fossil", "fuel", "fuels", "heat pump", "heat pumps",
+    "boiler", "insulation", "battery", "batteries", "electric", "ev", "evs", "fleet", "car",
+    "cars", "vehicle", "vehicles", "flying", "flight", "flights", "aviation", "airline",
+    "plane", "planes", "train", "trains", "shipping", "freight", "commute", "commuting",
+    # Materials, products and waste
+    "waste", "wasteful", "landfill", "plastic", "plastics", "microplastics", "recycle", "reuse",
+    "refill", "repair", "repairability", "refurbished", "second hand", "durable", "durability",
+    "circular", "lifecycle", "life cycle", "fashion", "clothing", "clothes", "textiles",
+    "cotton", "wool", "leather", "polyester", "aluminium", "aluminum", "glass", "paper",
+    "cardboard", "bamboo", "mining", "cobalt", "lithium", "water",
+    # Business and reporting
+    "ethical", "ethics", "fairtrade", "fair trade", "supplier", "suppliers", "sourcing",
+    "supply chain", "impact", "responsibility", "csr", "net zero", "scope", "target",
+    "targets", "report", "reporting", "disclosure", "audit", "regulation", "regulator",
+    "greenwashed", "certification", "b corp",
+]
+
+# Questions about the user's own organisation are in scope whatever the subject
+ORGANISATION_TERMS = [
+    "our", "ours", "we", "we're", "we've", "us", "company", "companies", "business",
+    "businesses", "brand", "brands", "product", "products", "customers", "staff",
+    "employees", "office", "team", "industry",
+]
+
+# Words that say nothing about the subject of a message
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "i", "i'm", "me", "my",
+    "you", "your", "it", "it's", "its", "this", "that", "these", "those", "there", "to", "of",
+    "in", "on", "at", "for", "with", "by", "from", "about", "into", "and", "or", "but", "so",
+    "if", "than", "then", "not", "no", "do", "does", "did", "can", "could", "would", "should",
+    "will", "what", "what's", "how", "who", "why", "when", "where", "which", "please", "just",
+    "some", "any", "up", "out", "get", "go", "ok",
+}
+
+
+class Route(NamedTuple):
+    intent: str
+    confidence: float
+    reply: Optional[str]    # Template answer, or None to ask the model
+    seconds: float
+
+
+def features(text: str) -> List[str]:
+    """Lower-cased words and word bigrams."""
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class IntentRouter:
+    """Multinomial Naive Bayes intent classifier with template answers."""
+
+    def __init__(self, examples: Dict[str, Iterable[str]] = None,
+                 confidence: float = ROUTE_CONFIDENCE, domain_terms: Iterable[str] = None):
+        self.confidence = confidence
+        examples = examples or TRAINING_EXAMPLES
+        counts = {intent: Counter() for intent in examples}
+        for intent, texts in examples.items():
+            for text in texts:
+                counts[intent].update(features(text))
+        vocabulary = set().union(*counts.values())
+        self.intents = list(examples)
+        # Uniform priors: how many examples an intent has says nothing about traffic
+        self.priors = {i: 0.0 for i in self.intents}
+        self.words = {i: {f for f in counts[i] if " " not in f} for i in self.intents}
+        self.seen = set().union(*self.words.values())
+        self.unknown = {}
+        self.weights = defaultdict(dict)    # feature -> {intent: log probability}
+        for intent in self.intents:
+            denominator = sum(counts[intent].values()) + SMOOTHING * (len(vocabulary) + 1)
+            self.unknown[intent] = math.log(SMOOTHING / denominator)
+            for feature, count in counts[intent].items():
+                self.weights[feature][intent] = math.log((count + SMOOTHING) / denominator)
+        # Claim lexicon terms, sustainability topics, the user's organisation and
+        # words that refer back to the conversation always mean "ask the model"
+        if domain_terms is None:
+            domain_terms = LEXICON + TOPIC_TERMS + ORGANISATION_TERMS
+        self.domain_words = set()
+        self.domain_phrases = set()
+        for term in domain_terms:
+            # The text is split into words on hyphens too, so "eco-friendly"
+            # is matched like "eco friendly"
+            parts = _WORD_RE.findall(term.lower())
+            if len(parts) > 1:
+                self.domain_phrases.add(" ".join(parts))
+            else:
+                self.domain_words.update(parts)
+        self.domain_stems = {w[:STEM_CHARS] for w in self.domain_words if len(w) >= 5}
+
+    def mentions_domain(self, words: List[str]) -> bool:
+        """True if `words` contain a domain word, a variant of one, or a domain phrase."""
+        if self.domain_words.intersection(words):
+            return True
+        if any(len(w) >= 5 and (w[:5] in self.domain_stems or w[:STEM_CHARS] in self.domain_stems)
+               for w in words):
+            return True
+        joined = f" {' '.join(words)} "
+        return any(f" {phrase} " in joined for phrase in self.domain_phrases)
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Most likely intent of `text` and its posterior probability."""
+        feats = [f for f in features(text) if f in self.weights]
+        scores = dict(self.priors)
+        for feature in feats:
+            weights = self.weights[feature]
+            for intent in self.intents:
+                scores[intent] += weights.get(intent, self.unknown[intent])
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        total = sum(math.exp(s - top) for s in scores.values())
+        return best, 1.0 / total
+
+    def route(self, text: str) -> Route:
+        """Template answer for `text` if it can be answered locally."""
+        started = time.perf_counter()
+        words = _WORD_RE.findall(text.lower())
+        intent, confidence = MODEL, 1.0
+        if words and len(words) <= MAX_ROUTED_WORDS and not self.mentions_domain(words):
+            intent, confidence = self.classify(text)
+            if not self._fits(intent, words):
+                intent = MODEL
+        reply = TEMPLATES.get(intent) if confidence >= self.confidence else None
+        return Route(intent, confidence, reply, time.perf_counter() - started)
+
+    def _fits(self, intent: str, words: List[str]) -> bool:
+        """
+        Words the intent's examples never used are ignored by the classifier,
+        so a familiar frame ("what do you think about ...") around an unseen
+        subject is not enough on its own.
+        """
+        if intent == MODEL:
+            return True
+        checked = [w for w in words if w not in STOPWORDS]
+        unseen = [w for w in checked if w not in self.words[intent]]
+        if intent not in OPEN_INTENTS:
+            return not unseen
+        # Off-topic subjects are endless, so one word no example used is
+        # allowed, but not words the in-scope examples use, and something
+        # the intent's examples did use must be there ("go on" has nothing)
+        if len(unseen) == len(checked) or any(w in self.words[MODEL] for w in unseen):
+            return False
+        return sum(w not in self.seen for w in unseen) <= MAX_NEW_WORDS
@@ -0,0 +1,255 @@
+"""
+Process-wide gateway for model calls.
+
+Every session shares one API key, so calls are coordinated here instead
+of each session calling the API directly:
+
+- Two token buckets (requests and tokens per minute) hold calls back
+  before the API would answer 429.
+- Waiting calls are granted round-robin across sessions, so one session
+  with many calls cannot starve the others.
+- A 429 or transient error pauses all calls (for Retry-After, if sent)
+  and the call is retried with exponential backoff.
+- Identical streamed requests that are in flight at the same time share
+  one upstream call; every caller receives the full stream.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+from tokens import count_message_tokens, count_tokens
+
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+REPLY_TOKENS = 800          # Assumed reply length when max_tokens isn't set
+MAX_STREAMS = 32            # Upstream streams read at once
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class TokenBucket:
+    """`rate` units per minute, with bursts up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        # Requests larger than the bucket would never fit; let them drain it
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class _Flight:
+    """Pieces of one upstream stream, read by every caller that asked for it."""
+
+    def __init__(self):
+        self.pieces: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.cond = threading.Condition()
+
+    def add(self, piece: str):
+        with self.cond:
+            self.pieces.append(piece)
+            self.cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        sent = 0
+        while True:
+            with self.cond:
+                while sent == len(self.pieces) and not self.done:
+                    self.cond.wait()
+                pieces = self.pieces[sent:]
+                finished = self.done and sent + len(pieces) == len(self.pieces)
+            sent += len(pieces)
+            yield from pieces
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class LLMGateway:
+    """
+    Rate-limited, fair and coalescing front for `create`, a callable with
+    the signature of openai.ChatCompletion.create. Calls that raise one of
+    `retry_on` are retried; `rate_limit_error` additionally pauses every
+    call for its Retry-After header or the backoff delay.
+    """
+
+    def __init__(self, create: Callable, retry_on: tuple = (), rate_limit_error: type = None,
+                 requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = TOKENS_PER_MINUTE,
+                 max_streams: int = MAX_STREAMS, max_retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_SECONDS):
+        self.create = create
+        self.retry_on = retry_on
+        self.rate_limit_error = rate_limit_error
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._waiting = OrderedDict()   # session -> deque of tickets, in turn order
+        self._flights = {}              # request key -> _Flight
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="llm-stream")
+        self.calls = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    # ---------------------------- Admission ---------------------------- #
+    def _acquire(self, session: str, tokens: int):
+        """Block until it is `session`'s turn and the buckets allow the call."""
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._waiting.setdefault(session, deque()).append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    if next(iter(self._waiting.values()))[0] is ticket:
+                        wait = max(self._paused_until - now,
+                                   self._requests.wait_for(1), self._tokens.wait_for(tokens))
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                self._requests.level -= 1
+                self._tokens.level -= min(tokens, self._tokens.capacity)
+                self.calls += 1
+            finally:
+                # Granted or abandoned, the ticket leaves the queue and the
+                # session goes to the back of the line if it has more waiting
+                tickets = self._waiting[session]
+                tickets.remove(ticket)
+                del self._waiting[session]
+                if tickets:
+                    self._waiting[session] = tickets
+                self.throttled_seconds += time.monotonic() - started
+                self._cond.notify_all()
+
+    def _settle(self, estimated: int, actual: int):
+        """Charge the token bucket for the difference once a reply's size is known."""
+        with self._cond:
+            self._tokens.level -= actual - estimated
+
+    def _backoff(self, error: BaseException, attempt: int):
+        delay = min(MAX_BACKOFF_SECONDS, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+        with self._cond:
+            self.retries += 1
+            if self.rate_limit_error is not None and isinstance(error, self.rate_limit_error):
+                self.rate_limited += 1
+                retry_after = (getattr(error, "headers", None) or {}).get("retry-after")
+                if retry_after:
+                    delay = max(delay, float(retry_after))
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        print(f"Model call error (retrying in {delay:.1f}s): {error}")
+        time.sleep(delay)
+
+    @staticmethod
+    def _prompt_tokens(messages: list) -> int:
+        return sum(count_message_tokens(m) for m in messages)
+
+    # ----------------------------- Calls ------------------------------ #
+    def complete(self, messages: list, session: str = "", **params):
+        """A non-streamed completion, made when the limits and queue allow."""
+        estimated = self._prompt_tokens(messages) + params.get("max_tokens", REPLY_TOKENS)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(session, estimated)
+            try:
+                response = self.create(messages=messages, **params)
+            except self.retry_on as e:
+                if attempt == self.max_retries:
+                    raise
+                self._backoff(e, attempt)
+                continue
+            usage = response.get("usage") or {}
+            if usage.get("total_tokens"):
+                self._settle(estimated, usage["total_tokens"])
+            return response
+
+    def stream(self, messages: list, session: str = "", **params) -> Iterator[str]:
+        """
+        Yield the reply's text pieces. An identical request already in
+        flight is joined rather than sent again.
+        """
+        key = hashlib.sha256(
+            json.dumps([messages, params], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        with self._cond:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._pool.submit(self._pump, key, flight, session, messages, params)
+            else:
+                self.coalesced += 1
+        return flight.follow()
+
+    def _pump(self, key: str, flight: _Flight, session: str, messages: list, params: dict):
+        """Read one upstream stream into `flight`, retrying until the first piece."""
+        prompt_tokens = self._prompt_tokens(messages)
+        estimated = prompt_tokens + params.get("max_tokens", REPLY_TOKENS)
+        error = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._acquire(session, estimated)
+                try:
+                    for chunk in self.create(messages=messages, stream=True, **params):
+                        piece = chunk.choices[0].delta.get("content", "")
+                        if piece:
+                            flight.add(piece)
+                    self._settle(estimated, prompt_tokens + count_tokens("".join(flight.pieces)))
+                    break
+                except self.retry_on as e:
+                    # Once pieces have been sent, a retry would repeat them
+                    if flight.pieces or attempt == self.max_retries:
+                        raise
+                    self._backoff(e, attempt)
+        except Exception as e:
+            error = e
+        finally:
+            with self._cond:
+                # Later identical requests start a new upstream call
+                del self._flights[key]
+            flight.finish(error)
+
+    def stats(self) -> dict:
+        """Counters, queue length and bucket levels, for display or export."""
+        with self._cond:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "throttled_seconds": self.throttled_seconds,
+                "queued": sum(len(t) for t in self._waiting.values()),
+                "streams_in_flight": len(self._flights),
+                "request_budget": self._requests.level,
+                "token_budget": self._tokens.level,
+            }
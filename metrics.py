@@ -0,0 +1,174 @@
+"""
+Stage-level latency tracing.
+
+Each chat turn gets a `Trace` that times its stages (parsing, OCR, time to
+first token, generation, saving, rendering) with the monotonic
+perf_counter. Durations are also folded into process-wide histograms,
+which can be exported as JSON (to a file or an HTTP endpoint) and in the
+Prometheus text format, together with gauges such as cache counters.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SAMPLES = 1024   # Per stage, for percentiles
+PREFIX = "gwrr"
+
+
+class Histogram:
+    """Bucketed durations plus a window of recent samples for percentiles."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """q-th percentile (0-100) of the recent samples, 0.0 if empty."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Registry:
+    """Process-wide stage histograms and named gauge callbacks."""
+
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {}
+        self.gauges: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def register_gauges(self, name: str, read: Callable[[], dict]):
+        """Export the numeric values of `read()` as gauges named <name>_<key>."""
+        with self._lock:
+            self.gauges[name] = read
+
+    def _gauge_values(self) -> Dict[str, dict]:
+        values = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                values[name] = {
+                    k: v for k, v in read().items()
+                    if isinstance(v, (int, float)) and not isinstance(v, bool)
+                }
+            except Exception as e:
+                print(f"Metrics gauge error ({name}): {e}")
+        return values
+
+    def snapshot(self) -> dict:
+        """Counts, totals and percentiles per stage, plus gauge values."""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "sum_seconds": h.sum,
+                    "p50": h.percentile(50),
+                    "p90": h.percentile(90),
+                    "p99": h.percentile(99),
+                }
+                for stage, h in self.stages.items()
+            }
+        return {"stages": stages, "gauges": self._gauge_values()}
+
+    def prometheus(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        name = f"{PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each stage of a chat turn.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        for group, values in sorted(self._gauge_values().items()):
+            for key, value in sorted(values.items()):
+                gauge = f"{PREFIX}_{group}_{key}"
+                lines.append(f"# TYPE {gauge} gauge")
+                lines.append(f"{gauge} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        """Write the snapshot to a file, replacing it atomically."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+
+
+class Trace:
+    """Stage durations of one chat turn, also recorded in the registry."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.registry = registry
+        self.started = time.time()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        """Add a duration measured elsewhere (e.g. worker time or TTFT)."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.registry.observe(name, seconds)
+
+# --------------------------- Export -------------------------------- #
+def serve(port: int, registry: Registry = REGISTRY, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json on a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, kind = registry.prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, kind = json.dumps(registry.snapshot()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
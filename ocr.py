@@ -0,0 +1,136 @@
+"""
+OCR pipeline for uploaded images.
+
+Phone photos of labels are often 12 MP or more, which makes Tesseract
+slow and less reliable. Images are normalised first: scans that report
+more than TARGET_DPI are scaled down to it, anything with a side longer
+than an A4 page at TARGET_DPI is scaled down to fit, and the result is
+rotated upright and converted to grayscale. Tesseract thresholds the
+grayscale image itself (binarising it here first loses thin strokes);
+Otsu's threshold is used only to find blank bands and light-on-dark
+labels, which are inverted. Blank bands are then skipped, and large
+images are cut into horizontal tiles along whitespace, which are
+recognised in parallel.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+TARGET_DPI = 300          # High-resolution scans are scaled down to this
+# Photos carry no meaningful DPI, so they are capped at the long side of an
+# A4 page at TARGET_DPI; page scans at TARGET_DPI are never capped further
+MAX_SIDE = round(11.7 * TARGET_DPI)
+BLANK_INK = 0.004         # Rows with less ink than this count as blank
+MIN_GAP_ROWS = 12         # Blank rows needed to separate two bands
+BAND_MARGIN = 16          # Rows kept around a band; tighter crops clip descenders
+TILE_HEIGHT = 900         # Target tile height in pixels
+TILE_MIN_PIXELS = 2_000_000  # Smaller images are recognised in one piece
+TILE_WORKERS = 4
+
+# Tesseract runs one subprocess per tile; keep each one single-threaded
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def otsu_threshold(histogram: List[int]) -> int:
+    """Gray level that best separates a 256-bin histogram into two classes."""
+    total = sum(histogram)
+    weighted = sum(i * h for i, h in enumerate(histogram))
+    best, threshold = -1.0, 127
+    background = background_sum = 0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_sum += level * count
+        mean_b = background_sum / background
+        mean_f = (weighted - background_sum) / foreground
+        between = background * foreground * (mean_b - mean_f) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold
+
+def binarise(image):
+    """Black and white copy of a grayscale image, split at Otsu's threshold."""
+    threshold = otsu_threshold(image.histogram())
+    return image.point(lambda v: 255 if v > threshold else 0, mode="1").convert("L")
+
+def prepare_image(image):
+    """Upright, downscaled grayscale copy of `image`, with dark text on light."""
+    from PIL import Image, ImageOps
+
+    # The scale comes from the full-size image and its DPI; only a reported
+    # DPI above TARGET_DPI counts, camera images rarely carry a real one
+    dpi = image.info.get("dpi", (TARGET_DPI,))[0] or TARGET_DPI
+    scale = min(1.0, TARGET_DPI / max(dpi, TARGET_DPI), MAX_SIDE / max(image.size))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # JPEGs can be decoded straight to grayscale at a reduced scale, which
+    # draft() keeps at least as large as `size`
+    image.draft("L", size)
+    image = image.convert("L")
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+    # Text should be dark on light; flip mostly-dark images such as dark labels
+    if _ink(binarise(image).resize((1, 1), Image.BOX).getpixel((0, 0))) > 0.5:
+        image = ImageOps.invert(image)
+    return image
+
+def _ink(mean: float) -> float:
+    return 1.0 - mean / 255.0
+
+def text_bands(image) -> List[Tuple[int, int]]:
+    """
+    (top, bottom) row ranges to recognise: runs of rows with ink, split at
+    blank gaps, merged up to TILE_HEIGHT and cut hard if a run is taller.
+    """
+    from PIL import Image
+
+    column = binarise(image).resize((1, image.height), Image.BOX)
+    inked = [_ink(column.getpixel((0, y))) >= BLANK_INK for y in range(image.height)]
+
+    runs = []
+    start = gap = None
+    for y, has_ink in enumerate(inked + [False] * MIN_GAP_ROWS):
+        if has_ink:
+            if start is None:
+                start = y
+            gap = None
+        elif start is not None:
+            gap = y if gap is None else gap
+            if y - gap + 1 >= MIN_GAP_ROWS:
+                runs.append((start, gap))
+                start = gap = None
+
+    bands = []
+    for top, bottom in runs:
+        top, bottom = max(0, top - BAND_MARGIN), min(image.height, bottom + BAND_MARGIN)
+        if bands and bottom - bands[-1][0] <= TILE_HEIGHT:
+            bands[-1] = (bands[-1][0], bottom)
+            continue
+        while bottom - top > TILE_HEIGHT:
+            bands.append((top, top + TILE_HEIGHT))
+            top += TILE_HEIGHT
+        bands.append((top, bottom))
+    return bands
+
+def _recognise(image) -> str:
+    import pytesseract
+    return pytesseract.image_to_string(image).strip()
+
+def ocr_image(image) -> str:
+    """Recognise the text in a PIL image using the preprocessing pipeline."""
+    image = prepare_image(image)
+    if image.width * image.height < TILE_MIN_PIXELS:
+        if not text_bands(image):
+            return ""
+        return _recognise(image)
+
+    tiles = [image.crop((0, top, image.width, bottom)) for top, bottom in text_bands(image)]
+    if len(tiles) <= 1:
+        return _recognise(tiles[0]) if tiles else ""
+    with ThreadPoolExecutor(max_workers=TILE_WORKERS) as pool:
+        texts = list(pool.map(_recognise, tiles))
+    return "\n".join(t for t in texts if t)
@@ -0,0 +1,153 @@
+"""
+Write-behind persistence for conversation rows.
+
+Saving used to block every turn on Supabase round-trips. Rows are now
+queued and written by a background thread in batches, with retries and
+exponential backoff, and whatever is still queued is flushed when the
+process exits.
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+BATCH_SIZE = 50          # Most rows sent in one insert
+BATCH_WAIT = 0.25        # Seconds to wait for more rows before writing a batch
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 0.5    # First retry delay, doubled each attempt
+MAX_BACKOFF_SECONDS = 15.0
+
+_STOP = object()
+
+
+def supabase_writer(client, upsert_keys: Optional[dict] = None,
+                    before_write: Optional[Callable[[], object]] = None) -> Callable:
+    """
+    Write function that inserts a batch of rows with a Supabase client.
+    Tables named in `upsert_keys` (table -> conflict column) are upserted
+    instead, skipping rows that already exist. `before_write` runs first,
+    e.g. to make sure the client's auth session is still valid.
+    """
+    upsert_keys = upsert_keys or {}
+
+    def write(table: str, rows: list):
+        if before_write is not None:
+            before_write()
+        if table in upsert_keys:
+            client.table(table).upsert(
+                rows, on_conflict=upsert_keys[table], ignore_duplicates=True
+            ).execute()
+            return
+        resp = client.table(table).insert(rows).execute()
+        if not resp.data:
+            raise RuntimeError(f"Insert into {table} returned no rows")
+    return write
+
+
+class PersistenceWorker:
+    """
+    Queue drained by a daemon thread that calls `write(table, rows)`.
+
+    Rows for the same table are batched together. A batch
+    that still fails after MAX_RETRIES attempts is dropped and counted.
+    """
+
+    def __init__(self, write: Callable, batch_size: int = BATCH_SIZE, batch_wait: float = BATCH_WAIT,
+                 max_retries: int = MAX_RETRIES, backoff: float = BACKOFF_SECONDS):
+        self.write = write
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="persistence-worker", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, table: str, row: dict):
+        """Queue a row for insertion; returns immediately."""
+        self._queue.put((table, row))
+
+    def depth(self) -> int:
+        """Rows queued or in flight."""
+        return self._queue.unfinished_tasks
+
+    def stats(self) -> dict:
+        """Queue depth and write counters."""
+        with self._lock:
+            return {
+                "queue_depth": self.depth(),
+                "written": self.written,
+                "failed": self.failed,
+                "retries": self.retries,
+            }
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written or dropped."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.depth():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush outstanding rows and stop the worker thread."""
+        if not self._thread.is_alive():
+            return
+        self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    # Put it back so the loop exits after this batch
+                    self._queue.task_done()
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+
+            groups = defaultdict(list)
+            for table, row in batch:
+                groups[table].append(row)
+            for table, rows in groups.items():
+                self._write_with_retry(table, rows)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_with_retry(self, table: str, rows: list):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write(table, rows)
+            except Exception as ex:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.failed += len(rows)
+                    print(f"Save error (gave up on {len(rows)} rows): {ex}")
+                    return
+                with self._lock:
+                    self.retries += 1
+                print(f"Save error (retrying): {ex}")
+                time.sleep(min(MAX_BACKOFF_SECONDS, self.backoff * 2 ** attempt))
+            else:
+                with self._lock:
+                    self.written += len(rows)
+                return
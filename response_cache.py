@@ -0,0 +1,90 @@
+"""
+Cache of model answers for repeated prompts.
+
+Most conversations open the same way (the greeting, then one of the
+suggestion buttons), so identical model calls are made again and again.
+Answers are kept under a hash of the model, temperature and normalised
+conversation, with a time-to-live and LRU eviction.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Optional
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+REPLAY_CHUNK_CHARS = 24
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Case- and whitespace-insensitive form of a message."""
+    return _SPACE_RE.sub(" ", text).strip().casefold()
+
+def prompt_key(model: str, temperature: float, messages: List[dict]) -> str:
+    """Hash identifying a model call by its settings and conversation."""
+    payload = json.dumps(
+        [model, temperature, [[m["role"], normalize(m["content"])] for m in messages]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def replay(text: str, chunk_chars: int = REPLAY_CHUNK_CHARS) -> Iterator[str]:
+    """Yield a cached answer in small pieces, like a streamed response."""
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
+
+
+class ResponseCache:
+    """Thread-safe LRU of answers that expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (stored at, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached answer for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, answer: str):
+        """Remember an answer, evicting the least recently used if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Counters and hit rate, for display or export."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+            }
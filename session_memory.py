@@ -0,0 +1,202 @@
+"""
+Bounded memory for attachment text across sessions.
+
+Extracted attachment text is the bulk of what a session holds. Instead of
+keeping it in session state, it is written once to an `AttachmentStore`
+on disk under its content hash, and messages and the document index keep
+only that hash. Recently read texts stay in memory up to a global budget
+and a per-session share of it; anything older is read back from disk.
+
+A `SessionTracker` notes when each session was last active and how much
+it holds. Sessions idle for longer than `idle_seconds` have their files
+released and their indexes cleared, and both feed memory gauges. An
+evicted session is remembered for another `idle_seconds` so it can be told
+its files are gone if it comes back.
+"""
+import atexit
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from conversation_store import text_hash
+
+MEMORY_BUDGET_BYTES = 256 * 1024 * 1024     # Attachment text kept in memory, all sessions
+SESSION_BUDGET_BYTES = 16 * 1024 * 1024     # Share of it one session may use
+IDLE_SECONDS = 60 * 60
+
+
+def _size(text: str) -> int:
+    # Python keeps most extracted text at one byte per character
+    return len(text)
+
+
+class AttachmentStore:
+    """Content-addressed attachment text on disk, with a bounded memory cache."""
+
+    def __init__(self, directory: Optional[str] = None, memory_budget: int = MEMORY_BUDGET_BYTES,
+                 session_budget: int = SESSION_BUDGET_BYTES):
+        if directory:
+            self.directory = Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+        else:
+            self.directory = Path(tempfile.mkdtemp(prefix="gwrr-attachments-"))
+            atexit.register(shutil.rmtree, self.directory, True)
+        self.memory_budget = memory_budget
+        self.session_budget = session_budget
+        self._cache = OrderedDict()     # hash -> (text, session charged for it)
+        self._owners = {}               # hash -> sessions that refer to it
+        self._resident = {}             # session -> bytes it has in _cache
+        self._lock = threading.Lock()
+        self.disk_reads = 0
+        self.evictions = 0
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.txt"
+
+    def put(self, session: str, text: str) -> str:
+        """Store `text` for `session` and return its handle (the content hash)."""
+        digest = text_hash(text)
+        path = self._path(digest)
+        with self._lock:
+            self._owners.setdefault(digest, set()).add(session)
+            if not path.exists():
+                tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+                tmp.write_text(text, encoding="utf-8")
+                tmp.replace(path)
+            self._remember(digest, text, session)
+        return digest
+
+    def get(self, session: str, digest: str) -> Optional[str]:
+        """The text for a handle, or None if it was released."""
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                self._cache.move_to_end(digest)
+                return entry[0]
+            try:
+                text = self._path(digest).read_text(encoding="utf-8")
+            except FileNotFoundError:
+                return None
+            self.disk_reads += 1
+            self._remember(digest, text, session)
+            return text
+
+    def _remember(self, digest: str, text: str, session: str):
+        if digest in self._cache:
+            self._cache.move_to_end(digest)
+            return
+        size = _size(text)
+        if size > self.session_budget:
+            return      # Too big to cache; always read from disk
+        self._cache[digest] = (text, session)
+        self._resident[session] = self._resident.get(session, 0) + size
+        # The session's own least recently used texts go first
+        while self._resident[session] > self.session_budget:
+            self._evict(next(d for d, (_, s) in self._cache.items() if s == session))
+        while sum(self._resident.values()) > self.memory_budget:
+            self._evict(next(iter(self._cache)))
+
+    def _evict(self, digest: str):
+        text, session = self._cache.pop(digest)
+        self._resident[session] -= _size(text)
+        if not self._resident[session]:
+            del self._resident[session]
+        self.evictions += 1
+
+    def release(self, session: str):
+        """Forget `session`; texts no other session refers to are deleted."""
+        with self._lock:
+            for digest, owners in list(self._owners.items()):
+                owners.discard(session)
+                if owners:
+                    continue
+                del self._owners[digest]
+                if digest in self._cache:
+                    self._evict(digest)
+                self._path(digest).unlink(missing_ok=True)
+            # Texts charged to this session but still used by others stay cached
+            for digest, (text, owner) in list(self._cache.items()):
+                if owner == session:
+                    self._evict(digest)
+
+    def resident_bytes(self, session: str) -> int:
+        with self._lock:
+            return self._resident.get(session, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident_bytes": sum(self._resident.values()),
+                "resident_texts": len(self._cache),
+                "stored_texts": len(self._owners),
+                "disk_bytes": sum(self._path(d).stat().st_size for d in self._owners
+                                  if self._path(d).exists()),
+                "disk_reads": self.disk_reads,
+                "evictions": self.evictions,
+            }
+
+
+class SessionTracker:
+    """Last activity and memory of each session, with idle eviction."""
+
+    def __init__(self, store: AttachmentStore, idle_seconds: float = IDLE_SECONDS):
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self._sessions: Dict[str, dict] = {}    # session -> last_seen, bytes, release
+        self._evicted: Dict[str, float] = {}  # session -> when it was evicted
+        self._lock = threading.Lock()
+        self.idle_evictions = 0
+
+    def touch(self, session: str, state_bytes: int, release: Callable[[], None]):
+        """
+        Record activity by `session`, which holds `state_bytes` besides its
+        attachments; `release()` drops its in-memory state on eviction.
+        Idle sessions are evicted as a side effect, and sessions evicted
+        more than `idle_seconds` ago are forgotten.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session] = {"last_seen": now, "bytes": state_bytes, "release": release}
+            self._evicted = {s: at for s, at in self._evicted.items()
+                             if now - at <= self.idle_seconds}
+            idle = [s for s, info in self._sessions.items()
+                    if now - info["last_seen"] > self.idle_seconds]
+            for s in idle:
+                release_state = self._sessions.pop(s)["release"]
+                self._evicted[s] = now
+                self.idle_evictions += 1
+                self.store.release(s)
+                release_state()
+
+    def was_evicted(self, session: str) -> bool:
+        """True once for a session that comes back after being evicted."""
+        with self._lock:
+            return self._evicted.pop(session, None) is not None
+
+    def session_bytes(self) -> Dict[str, int]:
+        with self._lock:
+            sessions = {s: info["bytes"] for s, info in self._sessions.items()}
+        return {s: held + self.store.resident_bytes(s) for s, held in sessions.items()}
+
+    def stats(self) -> dict:
+        """
+        Totals and the spread of per-session memory. Sessions aren't named,
+        so the set of gauges stays fixed and no conversation ids leak.
+        """
+        ordered = sorted(self.session_bytes().values())
+        return {
+            "sessions": len(ordered),
+            "total_bytes": sum(ordered),
+            "median_session_bytes": ordered[len(ordered) // 2] if ordered else 0,
+            "p95_session_bytes": ordered[int(round(0.95 * (len(ordered) - 1)))] if ordered else 0,
+            "max_session_bytes": ordered[-1] if ordered else 0,
+            "idle_evictions": self.idle_evictions,
+        }
+
+def state_bytes(messages: List[dict], *holders) -> int:
+    """Rough size of a session's messages plus objects with a `memory_bytes()` method."""
+    return sum(len(m["content"]) for m in messages) + sum(h.memory_bytes() for h in holders)
@@ -1,14 +1,22 @@
 import os
-import json
-from datetime import datetime
+import time
 
 import streamlit as st
-import openai
-from supabase import create_client, Client
-
-from PyPDF2 import PdfReader
-import pytesseract
-from PIL import Image
+from streamlit.errors import StreamlitAPIException
+
+import ingest
+from extraction_cache import ExtractionCache
+from doc_index import DocumentIndex, format_passages
+from claim_scan import ClaimScanner, format_claims
+from intent_router import IntentRouter
+from history import HistoryManager
+from persistence import PersistenceWorker, supabase_writer
+from supabase_session import SupabaseSession
+from response_cache import ResponseCache, prompt_key, replay
+from llm_gateway import LLMGateway
+from session_memory import AttachmentStore, SessionTracker, state_bytes
+from metrics import REGISTRY, Trace, serve as serve_metrics
+from conversation_store import ATTACHMENTS_TABLE, ConversationLog, attachment_meta, user_content
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -111,12 +119,41 @@ SUPABASE_PASSWORD = st.secrets["supabase"]["password"]
 
 OPENAI_API_KEY = st.secrets["openai"]["api_key"]
 OPENAI_MODEL = "gpt-4o-mini"  # Keep your requested model
+OPENAI_TEMPERATURE = 0.7
 
-# --- Create Supabase client ---
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# --- Shared Supabase client ---
+@st.cache_resource
+def get_supabase() -> SupabaseSession:
+    """One client and signed-in session for every browser session."""
+    db = SupabaseSession(SUPABASE_URL, SUPABASE_KEY, SUPABASE_EMAIL, SUPABASE_PASSWORD)
+    REGISTRY.register_gauges("supabase_auth", db.stats)
+    return db
 
 # --- Configure OpenAI ---
-openai.api_key = OPENAI_API_KEY
+def get_openai():
+    """The openai module, imported and configured on first use."""
+    import openai
+    openai.api_key = OPENAI_API_KEY
+    return openai
+
+@st.cache_resource
+def get_llm_gateway() -> LLMGateway:
+    """Rate limiting, fair queueing and retries for every model call in this process."""
+    errors = get_openai().error
+    gateway = LLMGateway(
+        lambda **params: get_openai().ChatCompletion.create(**params),
+        retry_on=(errors.RateLimitError, errors.ServiceUnavailableError,
+                  errors.APIConnectionError, errors.Timeout, errors.TryAgain),
+        rate_limit_error=errors.RateLimitError,
+        requests_per_minute=int(os.environ.get("GWRR_OPENAI_RPM", 500)),
+        tokens_per_minute=int(os.environ.get("GWRR_OPENAI_TPM", 200_000)),
+    )
+    REGISTRY.register_gauges("llm_gateway", gateway.stats)
+    return gateway
+
+def session_key() -> str:
+    """Identifies this browser session to the gateway's fair queue."""
+    return get_conversation_log().conversation_id
 
 # --------------------- Authentication & Setup ----------------------- #
 def authenticate_user():
@@ -141,17 +178,12 @@ def authenticate_user():
         st.stop()
 
 def auto_login():
-    """Attempt Supabase login."""
+    """Attempt Supabase login (shared by all sessions, so usually instant)."""
     if "session" not in st.session_state:
         try:
-            res = supabase.auth.sign_in_with_password({
-                "email": SUPABASE_EMAIL,
-                "password": SUPABASE_PASSWORD
-            })
-            if res.user:
-                st.session_state.session = res.session
-            else:
-                st.error("Supabase login failed. Check your credentials.")
+            st.session_state.session = get_supabase().session()
+        except RuntimeError as e:
+            st.error(str(e))
         except Exception as e:
             st.error("An error occurred during Supabase login.")
             print(f"Login error: {str(e)}")
@@ -177,174 +209,437 @@ def initialise_chat():
         ]
 
 # ---------------------- File Parsing --------------------------- #
-MAX_SIZE_MB = 5
-
-def parse_pdf(file_obj) -> str:
-    """Extract text from PDF."""
-    reader = PdfReader(file_obj)
-    pages = []
-    for page in reader.pages:
-        pages.append(page.extract_text() or "")
-    return "\n".join(pages)
-
-def parse_text_file(file_obj) -> str:
-    """Read a text file."""
-    return file_obj.read().decode("utf-8", errors="ignore")
-
-def parse_image(file_obj) -> str:
-    """Attempt OCR on an image. Tesseract must be installed on the system."""
-    try:
-        image = Image.open(file_obj)
-        text = pytesseract.image_to_string(image)
-        return text.strip()
-    except Exception as e:
-        st.warning(
-            "Sorry, we couldn't process this image with OCR. "
-            "Please ensure Tesseract is installed or upload a different format."
-        )
-        return ""
-
-def get_file_content(uploaded_file) -> str:
+MAX_SIZE_MB = 20  # Extraction stops at ingest.CHAR_BUDGET, so big reports stay cheap
+EXTRACTION_CACHE_MB = 64
+EXTRACTION_CACHE_DIR = os.environ.get("GWRR_EXTRACTION_CACHE_DIR")  # Optional disk tier
+
+@st.cache_resource
+def get_extraction_cache() -> ExtractionCache:
+    """Extraction cache shared by every session in this process."""
+    cache = ExtractionCache(EXTRACTION_CACHE_MB * 1024 * 1024, EXTRACTION_CACHE_DIR)
+    REGISTRY.register_gauges("extraction_cache", cache.stats)
+    return cache
+
+def get_files_content(uploaded_files, progress=None, timings=None) -> list:
     """
-    Extract textual content from file for analysis,
-    but show only "File: <filename>" to the user.
+    Extract textual content from several files at once.
+    PDF pages and images are parsed in parallel by the ingest engine;
+    results come back in upload order, with "" for anything skipped.
+    Worker seconds per file kind are added to `timings` if given.
     """
-    if uploaded_file.size > MAX_SIZE_MB * 1024 * 1024:
-        st.error(
-            f"**{uploaded_file.name}** is **too large** (limit: {MAX_SIZE_MB} MB). "
-            "Try a smaller file."
-        )
-        return ""
+    texts = [""] * len(uploaded_files)
+    jobs = []
+    for idx, uploaded_file in enumerate(uploaded_files):
+        if uploaded_file.size > MAX_SIZE_MB * 1024 * 1024:
+            st.error(
+                f"**{uploaded_file.name}** is **too large** (limit: {MAX_SIZE_MB} MB). "
+                "Try a smaller file."
+            )
+        elif ingest.file_kind(uploaded_file.name) is None:
+            st.warning(
+                f"**{uploaded_file.name}** is not a PDF, TXT, or common image type. "
+                "Please convert it or upload only the relevant portion."
+            )
+        else:
+            jobs.append(idx)
 
-    name_lower = uploaded_file.name.lower()
-    if name_lower.endswith(".pdf"):
-        return parse_pdf(uploaded_file)
-    elif name_lower.endswith(".txt"):
-        return parse_text_file(uploaded_file)
-    elif any(name_lower.endswith(ext) for ext in [".png", ".jpg", ".jpeg", ".bmp"]):
-        return parse_image(uploaded_file)
-    else:
-        st.warning(
-            f"**{uploaded_file.name}** is not a PDF, TXT, or common image type. "
-            "Please convert it or upload only the relevant portion."
-        )
-        return ""
+    files = [(uploaded_files[i].name, uploaded_files[i].getvalue()) for i in jobs]
+    results = ingest.extract_files(
+        files, progress=progress, cache=get_extraction_cache(), timings=timings
+    )
+    for idx, result in zip(jobs, results):
+        if result.error and ingest.file_kind(result.name) == "image":
+            st.warning(
+                "Sorry, we couldn't process this image with OCR. "
+                "Please ensure Tesseract is installed or upload a different format."
+            )
+            print(f"OCR error: {result.error}")
+        elif result.error:
+            st.warning(f"Sorry, we couldn't read **{result.name}**.")
+            print(f"Parse error: {result.error}")
+        texts[idx] = result.text
+    return texts
 
 # ---------------------- AI Interaction ----------------------------- #
-def get_ai_response(messages):
-    """Stream response from OpenAI."""
-    response_stream = openai.ChatCompletion.create(
+STREAM_REPAINT_SECONDS = 0.05  # Throttle re-renders of the streaming bubble
+DOC_CONTEXT_TOKENS = 1500  # Budget for document excerpts retrieved per turn
+CLAIM_CONTEXT_TOKENS = 2000  # Budget for claim pre-screens on the turn files are uploaded
+HISTORY_TOKEN_BUDGET = 6000  # Hard cap on conversation history sent per turn
+SUMMARY_MAX_TOKENS = 600
+RESPONSE_CACHE_ENTRIES = 512
+RESPONSE_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+def summarize_history(summary, messages) -> str:
+    """Fold older messages into the running conversation summary."""
+    transcript = "\n\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    if summary:
+        transcript = f"Summary so far:\n{summary}\n\nNew messages:\n{transcript}"
+    response = get_llm_gateway().complete(
+        [
+            {
+                "role": "system",
+                "content": (
+                    "Summarise this conversation between a user and Greenwashing Radar Rover "
+                    "for the assistant's own memory. Keep the user's goals, products, claims "
+                    "under review, files discussed and any advice already given. Be concise."
+                )
+            },
+            {"role": "user", "content": transcript}
+        ],
+        session=session_key(),
         model=OPENAI_MODEL,
-        messages=messages,
-        stream=True,
-        temperature=0.7
+        temperature=0.2,
+        max_tokens=SUMMARY_MAX_TOKENS
     )
-    accumulated = ""
-    for chunk in response_stream:
-        portion = chunk.choices[0].delta.get("content", "")
-        accumulated += portion
-        yield accumulated
+    return response["choices"][0]["message"]["content"].strip()
+
+def get_history_manager() -> HistoryManager:
+    """This session's history compactor."""
+    if "history" not in st.session_state:
+        st.session_state.history = HistoryManager(HISTORY_TOKEN_BUDGET, summarize_history)
+    return st.session_state.history
+
+def get_doc_index() -> DocumentIndex:
+    """This session's index of uploaded document text (kept in the attachment store)."""
+    if "doc_index" not in st.session_state:
+        st.session_state.doc_index = DocumentIndex(get_attachment_store(), session_key())
+    return st.session_state.doc_index
+
+@st.cache_resource
+def get_claim_scanner() -> ClaimScanner:
+    """Claim matcher built once from the lexicon and shared by every session."""
+    return ClaimScanner()
+
+def get_claim_reports() -> dict:
+    """This session's claim pre-screens, by file name."""
+    if "claim_reports" not in st.session_state:
+        st.session_state.claim_reports = {}
+    return st.session_state.claim_reports
+
+def prompt_content(msg) -> str:
+    """Message text as sent to the model: attachments are named, not inlined."""
+    if "attachments" not in msg:
+        return msg["content"]
+    blocks = [msg["text"]] if msg["text"] else []
+    blocks += [f"File: {attachment['name']}" for attachment in msg["attachments"]]
+    return "\n\n".join(blocks)
+
+def build_prompt(messages) -> list:
+    """
+    Messages for the model. Older turns are folded into a running summary
+    to stay within HISTORY_TOKEN_BUDGET, and instead of resending every
+    uploaded file, the passages most relevant to the latest user turn are
+    retrieved from the session's document index and added just before it.
+    On the turn files are uploaded, their claim pre-screens (outline and
+    claim passages) are used instead where claims were found.
+    """
+    prompt = [{"role": msg["role"], "content": prompt_content(msg)} for msg in messages]
+    prompt = get_history_manager().compact(prompt)
+    index = get_doc_index()
+    latest = messages[-1]
+    if len(index) and latest["role"] == "user":
+        names = {attachment["name"] for attachment in latest.get("attachments", [])}
+        reports = [
+            report for name, report in sorted(get_claim_reports().items())
+            if name in names and report.spans
+        ]
+        for report in reports:
+            prompt.insert(-1, {
+                "role": "system",
+                "content": format_claims(report, CLAIM_CONTEXT_TOKENS // len(reports))
+            })
+        if len(reports) < len(names) or not names:
+            passages = index.select(
+                latest.get("text", latest["content"]), DOC_CONTEXT_TOKENS, names or None
+            )
+            if passages:
+                prompt.insert(-1, {"role": "system", "content": format_passages(passages)})
+    return prompt
+
+@st.cache_resource
+def get_intent_router() -> IntentRouter:
+    """Local classifier that answers greetings and off-topic turns from templates."""
+    return IntentRouter()
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Answers to repeated prompts, shared by every session."""
+    cache = ResponseCache(RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+    REGISTRY.register_gauges("response_cache", cache.stats)
+    return cache
+
+def get_ai_response(messages):
+    """
+    Stream response from OpenAI through the gateway, yielding each new
+    piece of text. Answers to prompts seen before are replayed from the
+    response cache.
+    """
+    cache = get_response_cache()
+    key = prompt_key(OPENAI_MODEL, OPENAI_TEMPERATURE, messages)
+    cached = cache.get(key)
+    if cached is not None:
+        yield from replay(cached)
+        return
+
+    # Identical prompts already being answered share that stream
+    parts = []
+    for portion in get_llm_gateway().stream(
+        messages, session=session_key(), model=OPENAI_MODEL, temperature=OPENAI_TEMPERATURE
+    ):
+        parts.append(portion)
+        yield portion
+    if parts:
+        cache.put(key, "".join(parts))
+
+def stream_ai_response(messages, placeholder, trace) -> str:
+    """
+    Paint the assistant reply into `placeholder` as tokens arrive.
+    Pieces are buffered and joined only when repainting. Time to first
+    token and total generation time are recorded on `trace`.
+    """
+    started = time.perf_counter()
+    parts = []
+    pieces = get_ai_response(messages)
+    with st.spinner("♻️ Thinking..."):
+        first = next(pieces, None)
+    trace.record("openai_ttft", time.perf_counter() - started)
+    if first is None:
+        trace.record("openai_total", time.perf_counter() - started)
+        return ""
+
+    parts.append(first)
+    placeholder.markdown(chat_message_html("assistant", first), unsafe_allow_html=True)
+    last_paint = time.monotonic()
+    for portion in pieces:
+        parts.append(portion)
+        if time.monotonic() - last_paint >= STREAM_REPAINT_SECONDS:
+            placeholder.markdown(
+                chat_message_html("assistant", "".join(parts)), unsafe_allow_html=True
+            )
+            last_paint = time.monotonic()
+
+    full_resp = "".join(parts)
+    placeholder.markdown(chat_message_html("assistant", full_resp), unsafe_allow_html=True)
+    trace.record("openai_total", time.perf_counter() - started)
+    return full_resp
+
+@st.cache_resource
+def get_persistence_worker() -> PersistenceWorker:
+    """Background writer shared by every session in this process."""
+    db = get_supabase()
+    write = supabase_writer(db.client, {ATTACHMENTS_TABLE: "hash"}, before_write=db.session)
+
+    def timed_write(table, rows):
+        started = time.perf_counter()
+        try:
+            write(table, rows)
+        finally:
+            REGISTRY.observe("supabase_write", time.perf_counter() - started)
+
+    worker = PersistenceWorker(timed_write)
+    REGISTRY.register_gauges("persistence", worker.stats)
+    return worker
+
+def get_conversation_log() -> ConversationLog:
+    """This session's conversation, under one id for its whole lifetime."""
+    if "conversation_log" not in st.session_state:
+        st.session_state.conversation_log = ConversationLog()
+    return st.session_state.conversation_log
 
 def save_conversation():
-    """Save conversation to Supabase if session is present."""
+    """
+    Queue messages added since the last save for Supabase, if session is present.
+    The insert happens on a background thread, so the chat doesn't wait on it.
+    """
     if "session" not in st.session_state:
         return
-    conv_id = datetime.now().strftime('%Y%m%d%H%M%S')
-    data = {
-        "conversation_id": conv_id,
-        "messages": json.dumps(st.session_state.messages, indent=2),
-        "created_at": datetime.now().isoformat(),
-        "user_id": "anonymous_user"
-    }
-    try:
-        supabase.auth.set_session(
-            st.session_state.session.access_token,
-            st.session_state.session.refresh_token
+    worker = get_persistence_worker()
+    store, session = get_attachment_store(), session_key()
+    rows = get_conversation_log().new_rows(
+        st.session_state.messages, load=lambda digest: store.get(session, digest)
+    )
+    for table, row in rows:
+        worker.submit(table, row)
+
+# ------------------------ Session Memory -------------------------- #
+INLINE_ATTACHMENT_CHARS = 2000  # Longer attachment text goes to the attachment store
+ATTACHMENT_DIR = os.environ.get("GWRR_ATTACHMENT_DIR")  # Default: a temporary directory
+
+@st.cache_resource
+def get_attachment_store() -> AttachmentStore:
+    """Disk-backed attachment text shared by every session, with a bounded memory cache."""
+    store = AttachmentStore(ATTACHMENT_DIR)
+    REGISTRY.register_gauges("attachments", store.stats)
+    return store
+
+@st.cache_resource
+def get_session_tracker() -> SessionTracker:
+    """Activity and memory of every session, for idle eviction and gauges."""
+    tracker = SessionTracker(get_attachment_store())
+    REGISTRY.register_gauges("session_memory", tracker.stats)
+    return tracker
+
+def track_session_memory():
+    """
+    Report this session as active and how much it holds. If it was idle
+    long enough to be evicted, its documents are gone; say so.
+    """
+    tracker = get_session_tracker()
+    if tracker.was_evicted(session_key()):
+        st.info(
+            "This conversation was idle for a while, so its uploaded files were cleared. "
+            "Upload them again to ask about their contents."
         )
-        resp = supabase.table("conversations").insert(data).execute()
-        if not resp.data:
-            st.error("Could not save conversation.")
-    except Exception as ex:
-        st.error("An error occurred while saving. Please try again.")
-        print(f"Save error: {ex}")
+    index, reports = get_doc_index(), get_claim_reports()
+
+    def release():
+        index.clear()
+        reports.clear()
+
+    tracker.touch(session_key(), state_bytes(st.session_state.messages, index), release)
 
 # ------------------ Display + Suggestions ----------------------- #
-def display_chat_messages():
+def message_display_text(msg) -> str:
     """
-    Show each message with user or assistant background.
-    If user message starts with 'File: <filename>\n<extracted text>',
-    only show 'File: <filename>' to the user.
+    Text shown for a message. If a user message starts with
+    'File: <filename>\n<extracted text>', only 'File: <filename>' is shown.
     """
-    # st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-
-    for idx, msg in enumerate(st.session_state.messages):
-        # Determine role-based styling
-        if msg["role"] == "assistant":
-            message_class = "assistant"
-            icon_class = "assistant-icon"
-            icon_emoji = "♻️"
-        else:
-            message_class = "user"
-            icon_class = "user-icon"
-            icon_emoji = "🕵️"
-
-        # By default, we show the entire message
-        display_text = msg["content"]
-
-        # If it's a user message containing file content, only show "File: <filename>"
-        if msg["role"] == "user" and display_text.startswith("File: "):
-            # If there's a newline, only display the first line
-            # so the OCR text is hidden from the UI
-            first_line, _, _ = display_text.partition("\n")
-            display_text = first_line
+    # By default, we show the entire message
+    display_text = msg["content"]
+
+    # If it's a user message containing file content, only show "File: <filename>"
+    if msg["role"] == "user" and display_text.startswith("File: "):
+        # If there's a newline, only display the first line
+        # so the OCR text is hidden from the UI
+        first_line, _, _ = display_text.partition("\n")
+        display_text = first_line
+    return display_text
+
+def chat_message_html(role, display_text) -> str:
+    """Chat bubble markup with user or assistant styling."""
+    # Determine role-based styling
+    if role == "assistant":
+        message_class = "assistant"
+        icon_class = "assistant-icon"
+        icon_emoji = "♻️"
+    else:
+        message_class = "user"
+        icon_class = "user-icon"
+        icon_emoji = "🕵️"
 
-        st.markdown(
-            f"""
+    return f"""
             <div class="chat-message {message_class}">
                 <div class="{icon_class}">{icon_emoji}</div>
                 <div class="chat-content">{display_text}</div>
             </div>
-            """,
+            """
+
+CHAT_WINDOW = 20        # Most recent messages drawn on each rerun
+CHAT_WINDOW_STEP = 20   # Older messages revealed per click on "Show earlier"
+SUGGESTIONS = [
+    "Ask about deeper analysis of marketing claims",
+    "Inquire about alternative sustainable approaches",
+    "Request a bullet-point list of green strategies"
+]
+
+def rerun_chat():
+    """Redraw just the chat fragment, or the whole page if not in a fragment rerun."""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def display_chat_messages():
+    """
+    Show the most recent messages with user or assistant background,
+    and a button to reveal older ones. Suggestions are offered under the
+    latest assistant message only.
+    """
+    if "chat_window" not in st.session_state:
+        st.session_state.chat_window = CHAT_WINDOW
+    messages = st.session_state.messages
+    hidden = max(0, len(messages) - st.session_state.chat_window)
+    if hidden:
+        if st.button(f"⬆️ Show earlier messages ({hidden} hidden)", key="show_earlier"):
+            st.session_state.chat_window += CHAT_WINDOW_STEP
+            rerun_chat()
+
+    for msg in messages[hidden:]:
+        st.markdown(
+            chat_message_html(msg["role"], message_display_text(msg)),
             unsafe_allow_html=True
         )
 
-        # If assistant message, add optional suggestions
-        if msg["role"] == "assistant":
-            # Some example hints
-            suggestions = [
-                "Ask about deeper analysis of marketing claims",
-                "Inquire about alternative sustainable approaches",
-                "Request a bullet-point list of green strategies"
-            ]
-            st.write('<div class="suggestion-buttons">', unsafe_allow_html=True)
-            for s_idx, hint in enumerate(suggestions):
-                if st.button(hint, key=f"suggestion_{idx}_{s_idx}"):
-                    # Put the hint in the user input box
-                    st.session_state.draft_input = hint
-                    st.rerun()
-            st.write('</div>', unsafe_allow_html=True)
-
-    st.markdown("</div>", unsafe_allow_html=True)
-
-# -------------------------- Main App ------------------------------- #
-def main():
-    authenticate_user()
-    auto_login()
+    if messages and messages[-1]["role"] == "assistant":
+        st.write('<div class="suggestion-buttons">', unsafe_allow_html=True)
+        for s_idx, hint in enumerate(SUGGESTIONS):
+            if st.button(hint, key=f"suggestion_{s_idx}"):
+                # Put the hint in the user input box
+                st.session_state.draft_input = hint
+                rerun_chat()
+        st.write('</div>', unsafe_allow_html=True)
+
+# ------------------------ Metrics + Debug ------------------------- #
+METRICS_FILE = os.environ.get("GWRR_METRICS_FILE")  # JSON snapshot after each turn
+METRICS_PORT = os.environ.get("GWRR_METRICS_PORT")  # Serves /metrics and /metrics.json
+
+@st.cache_resource
+def start_metrics_server():
+    """Start the metrics endpoint once per process, if a port is configured."""
+    if METRICS_PORT:
+        return serve_metrics(int(METRICS_PORT))
+    return None
+
+def export_metrics():
+    """Write the metrics snapshot to METRICS_FILE, if configured."""
+    if METRICS_FILE:
+        try:
+            REGISTRY.write_json(METRICS_FILE)
+        except OSError as e:
+            print(f"Metrics export error: {e}")
 
-    # If we want to preserve a "draft" input for the user after hint clicks
-    if "draft_input" not in st.session_state:
-        st.session_state.draft_input = ""
+def record_render(seconds):
+    """
+    Record how long the chat took to draw. The first render after a turn
+    belongs to that turn's trace.
+    """
+    trace = st.session_state.get("last_trace")
+    if trace is not None and "render" not in trace.stages:
+        trace.record("render", seconds)
+    else:
+        REGISTRY.observe("render", seconds)
 
-    st.markdown('<div class="title-container">', unsafe_allow_html=True)
-    st.write("# ♻️ Greenwashing Radar Rover")
-    st.write("### Unmasking questionable sustainability claims in your projects or products")
-    st.markdown('</div>', unsafe_allow_html=True)
-    st.write("Built with 💚  by Spaceship AI.")
-    st.write("---")
+def show_debug_panel():
+    """Stage timings of the last turn, shown when the URL has ?debug=1."""
+    if st.query_params.get("debug") != "1":
+        return
+    trace = st.session_state.get("last_trace")
+    with st.expander("🛠️ Last turn timings"):
+        if trace is None:
+            st.write("No turns yet.")
+            return
+        st.table({
+            "stage": list(trace.stages),
+            "ms": [round(seconds * 1000, 1) for seconds in trace.stages.values()],
+        })
+        st.json(REGISTRY.snapshot(), expanded=False)
 
-    initialise_chat()
+# -------------------------- Main App ------------------------------- #
+@st.fragment
+def chat_area():
+    """
+    The conversation and input form. Runs as a fragment, so sending a
+    message or clicking a suggestion redraws only this part of the page.
+    """
+    # Every turn counts as activity, so a session isn't evicted mid-conversation
+    track_session_memory()
     # Display the conversation first
+    started = time.perf_counter()
     display_chat_messages()
+    record_render(time.perf_counter() - started)
+    show_debug_panel()
+    # New turns are painted here while the reply streams in
+    live_area = st.container()
 
     # Then the user input form
     with st.form("user_input_form", clear_on_submit=True):
@@ -358,48 +653,96 @@ def main():
     if submit_button:
         # Clear the draft after they send
         st.session_state.draft_input = ""
-
-        content_blocks = []
-        if user_input.strip():
-            content_blocks.append(user_input)
-
-        # Parse each uploaded file
-        for uf in uploaded_files:
-            extracted_text = get_file_content(uf)
+        trace = Trace()
+
+        text = user_input if user_input.strip() else ""
+
+        # Parse all uploaded files in parallel
+        extracted = []
+        if uploaded_files:
+            progress_bar = st.progress(0.0, text="Reading files...")
+            worker_seconds = {}
+            with trace.stage("parse"):
+                extracted = get_files_content(
+                    uploaded_files,
+                    progress=lambda done, total: progress_bar.progress(
+                        done / total, text=f"Reading files... ({done}/{total})"
+                    ),
+                    timings=worker_seconds,
+                )
+            if "image" in worker_seconds:
+                trace.record("ocr", worker_seconds["image"])
+            progress_bar.empty()
+        attachments = []
+        for uf, extracted_text in zip(uploaded_files, extracted):
+            # Index the text so relevant passages can be retrieved per turn
             if extracted_text:
-                # Add "File: <filename>\n<extracted text>" so AI can see the text
-                content_blocks.append(f"File: {uf.name}\n{extracted_text}")
-            else:
-                # Show user that they attempted to upload something
-                content_blocks.append(f"File: {uf.name}")
+                get_doc_index().add_document(uf.name, extracted_text)
+                get_claim_reports()[uf.name] = get_claim_scanner().scan(uf.name, extracted_text)
+            # Long texts stay out of session state; the message keeps their hash
+            stored = len(extracted_text) > INLINE_ATTACHMENT_CHARS
+            if stored:
+                get_attachment_store().put(session_key(), extracted_text)
+            attachments.append(attachment_meta(uf.name, extracted_text, stored))
 
         # If there's any user input to add
-        if content_blocks:
-            final_user_msg = "\n\n".join(content_blocks)
-            st.session_state.messages.append(
-                {"role": "user", "content": final_user_msg}
-            )
-
-            # Generate AI response
-            with st.spinner("♻️ Thinking..."):
-                full_resp = ""
-                response_stream = openai.ChatCompletion.create(
-                    model=OPENAI_MODEL,
-                    messages=st.session_state.messages,
-                    stream=True,
-                    temperature=0.7
+        if text or attachments:
+            # Attachments become "File: <filename>\n<extracted text>" blocks
+            # after the typed text, so the transcript keeps what the AI saw
+            user_msg = {"role": "user", "content": user_content(text, attachments, extracted)}
+            if attachments:
+                user_msg["text"] = text
+                user_msg["attachments"] = attachments
+            st.session_state.messages.append(user_msg)
+
+            # Stream the AI response into the chat as it is generated
+            with live_area:
+                st.markdown(
+                    chat_message_html("user", message_display_text(st.session_state.messages[-1])),
+                    unsafe_allow_html=True
                 )
-                for chunk in response_stream:
-                    part = chunk.choices[0].delta.get("content", "")
-                    full_resp += part
+                # Greetings, "what can you do" and off-topic turns skip the model
+                route = get_intent_router().route(text) if not attachments else None
+                if route:
+                    trace.record("route", route.seconds)
+                if route and route.reply:
+                    full_resp = route.reply
+                    st.markdown(chat_message_html("assistant", full_resp), unsafe_allow_html=True)
+                else:
+                    with trace.stage("prompt"):
+                        prompt = build_prompt(st.session_state.messages)
+                    full_resp = stream_ai_response(prompt, st.empty(), trace)
 
             st.session_state.messages.append({"role": "assistant", "content": full_resp})
 
             # Save conversation automatically
-            save_conversation()
+            with trace.stage("save"):
+                save_conversation()
+            # The render of the updated chat is added on the rerun
+            st.session_state.last_trace = trace
+            export_metrics()
 
             # Rerun to refresh chat above
-            st.rerun()
+            rerun_chat()
+
+def main():
+    start_metrics_server()
+    authenticate_user()
+    auto_login()
+
+    # If we want to preserve a "draft" input for the user after hint clicks
+    if "draft_input" not in st.session_state:
+        st.session_state.draft_input = ""
+
+    st.markdown('<div class="title-container">', unsafe_allow_html=True)
+    st.write("# ♻️ Greenwashing Radar Rover")
+    st.write("### Unmasking questionable sustainability claims in your projects or products")
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.write("Built with 💚  by Spaceship AI.")
+    st.write("---")
+
+    initialise_chat()
+    chat_area()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,101 @@
+"""
+One Supabase client and auth session for the whole process.
+
+Every browser session used to sign in with the same service credentials,
+and every save re-applied the tokens. The manager here signs in once,
+refreshes the access token shortly before it expires, and is safe to
+share between the threads Streamlit runs sessions on.
+"""
+import threading
+import time
+
+REFRESH_MARGIN_SECONDS = 120  # Refresh this long before the token expires
+
+
+class SupabaseSession:
+    """Thread-safe owner of a shared client and its signed-in session."""
+
+    def __init__(self, url: str, key: str, email: str, password: str,
+                 refresh_margin: float = REFRESH_MARGIN_SECONDS):
+        self.url = url
+        self.key = key
+        self.email = email
+        self.password = password
+        self.refresh_margin = refresh_margin
+        self.logins = 0
+        self.refreshes = 0
+        self.failures = 0
+        self._client = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The shared client, created on first use."""
+        with self._lock:
+            return self._get_client()
+
+    def session(self):
+        """
+        A signed-in session with time left on its access token. Signs in on
+        first use, refreshes near expiry and signs in again if refreshing
+        fails. Raises if Supabase rejects the credentials.
+        """
+        with self._lock:
+            if self._session is None:
+                return self._sign_in()
+            if self._expires_soon():
+                try:
+                    return self._refresh()
+                except Exception as e:
+                    self.failures += 1
+                    print(f"Token refresh error: {e}")
+                    return self._sign_in()
+            return self._session
+
+    def stats(self) -> dict:
+        """How many logins and refreshes have been performed."""
+        with self._lock:
+            return {
+                "logins": self.logins,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "expires_at": getattr(self._session, "expires_at", None),
+            }
+
+    def _get_client(self):
+        if self._client is None:
+            from supabase import ClientOptions, create_client
+            # Refreshing is done here, so the client doesn't run its own timer
+            self._client = create_client(
+                self.url, self.key, options=ClientOptions(auto_refresh_token=False)
+            )
+        return self._client
+
+    def _expires_soon(self) -> bool:
+        expires_at = getattr(self._session, "expires_at", None)
+        return expires_at is not None and expires_at - time.time() <= self.refresh_margin
+
+    def _sign_in(self):
+        try:
+            res = self._get_client().auth.sign_in_with_password({
+                "email": self.email,
+                "password": self.password
+            })
+        except Exception:
+            self.failures += 1
+            raise
+        self.logins += 1
+        if not res.user or not res.session:
+            self.failures += 1
+            raise RuntimeError("Supabase login failed. Check your credentials.")
+        self._session = res.session
+        return self._session
+
+    def _refresh(self):
+        res = self._get_client().auth.refresh_session(self._session.refresh_token)
+        if not res.session:
+            raise RuntimeError("Supabase returned no session on refresh")
+        self.refreshes += 1
+        self._session = res.session
+        return self._session
@@ -0,0 +1,13 @@
+"""Cheap token estimates for prompt budgeting."""
+
+CHARS_PER_TOKEN = 4     # Rule of thumb for English text with OpenAI tokenizers
+MESSAGE_OVERHEAD = 4    # Role and separators added per chat message
+
+
+def count_tokens(text: str) -> int:
+    """Approximate number of tokens in `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def count_message_tokens(message) -> int:
+    """Approximate tokens a chat message adds to a prompt."""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD